@@ -28,6 +28,10 @@ class FastaProcessorConfig(AppConfig):
         try:
             from .services import EggnogProcessor
             
+            # Job processes spawned by the queue inherit the server's initialized paths
+            if EggnogProcessor.adopt_inherited_paths():
+                return
+            
             # Get paths from settings or use defaults
             from django.conf import settings
             eggnog_db_path = getattr(settings, 'EGGNOG_DB_PATH', '/home/ser1dai/eggnog_db_final')
@@ -0,0 +1,160 @@
+"""
+Byte-level FASTA scanning helpers for building the gut database.
+
+Kept free of Django imports so worker processes started with the 'spawn'
+method can import them cheaply.
+"""
+import mmap
+import os
+import re
+
+# KO ids in proteome headers, tried in this order: K00813, KO:813, KO00813
+_HEADER_KO_RE = re.compile(rb'(K\d{5})')
+_HEADER_KO_COLON_RE = re.compile(rb'KO:(\d+)')
+_HEADER_KO_PREFIX_RE = re.compile(rb'KO(\d{5})')
+
+
+def fadvise(fd, advice, offset=0, length=0):
+    """Page-cache hint for a byte range of fd (os.POSIX_FADV_* name); a no-op where unsupported"""
+    advice = getattr(os, advice, None)
+    if advice is None or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass
+
+
+def header_ko(header):
+    """Return the KO id (bytes, normalized to K#####) named in a FASTA header, or None"""
+    m = _HEADER_KO_RE.search(header)
+    if m:
+        return m.group(1)
+    m = _HEADER_KO_COLON_RE.search(header) or _HEADER_KO_PREFIX_RE.search(header)
+    if m:
+        return b'K' + m.group(1).zfill(5)
+    return None
+
+
+def record_ranges(path, n_parts):
+    """
+    Cut a FASTA file into up to n_parts byte ranges of similar size at record boundaries.
+    
+    Each cut at size * k / n_parts moves forward to the next line starting with '>', so
+    no record is split; small files or very long records give fewer ranges.
+    
+    Args:
+        path: Path to the FASTA file
+        n_parts: Desired number of ranges
+    
+    Returns:
+        list: (start, end) byte ranges covering the whole file in order (a single
+              range when n_parts <= 1 or the file is empty)
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        boundaries = [0]
+        if n_parts > 1 and size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for k in range(1, n_parts):
+                    cut = mm.find(b'\n>', max(size * k // n_parts, boundaries[-1]))
+                    if cut == -1:
+                        break
+                    if cut + 1 > boundaries[-1]:
+                        boundaries.append(cut + 1)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def scan_ko_shard(path, start, end, kos):
+    """
+    Find the longest sequence per listed KO in bytes [start, end) of a FASTA file.
+    
+    start and end must fall on record boundaries. Sequence lines are kept only for
+    records whose header names a listed KO, and joined once when the record ends.
+    The shard is read once, so it is marked sequential for readahead and dropped from
+    the page cache afterwards (it would otherwise evict the DIAMOND databases).
+    
+    Args:
+        path: Path to the FASTA file
+        start: Offset of the first record in the shard
+        end: Offset just past the last record in the shard
+        kos: Set of KO ids (bytes) to keep
+    
+    Returns:
+        dict: KO -> (header, sequence) in order of first appearance; on equal
+              length the earlier record wins
+    """
+    best = {}
+    current_ko = None
+    current_hdr = None
+    current_chunks = []
+    
+    def commit():
+        if current_ko is None:
+            return
+        length = sum(map(len, current_chunks))
+        if current_ko not in best or length > len(best[current_ko][1]):
+            best[current_ko] = (current_hdr, b''.join(current_chunks))
+    
+    with open(path, 'rb') as f:
+        fadvise(f.fileno(), 'POSIX_FADV_SEQUENTIAL', start, end - start)
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                mm.seek(start)
+                while mm.tell() < end:
+                    line = mm.readline()
+                    if line[:1] == b'>':
+                        commit()
+                        current_hdr = line.strip()
+                        current_chunks = []
+                        current_ko = header_ko(current_hdr)
+                        if current_ko not in kos:
+                            current_ko = None
+                    elif current_ko is not None:
+                        current_chunks.append(line.strip())
+                commit()
+        finally:
+            # After unmapping: the kernel keeps pages that are still mapped
+            fadvise(f.fileno(), 'POSIX_FADV_DONTNEED', start, end - start)
+    return best
+
+
+def ko_record_spans(path, kos):
+    """
+    Find the records of a FASTA file whose header mentions a listed KO.
+    
+    Only header lines are inspected (sequence lines cannot contain digits), so the
+    scan jumps from record to record with mmap.find instead of reading every line.
+    
+    Args:
+        path: Path to the FASTA file
+        kos: Set of KO ids (bytes) to keep
+    
+    Returns:
+        list: (start, end) byte ranges of matching records, adjacent records merged
+    """
+    spans = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return spans
+        fadvise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            pos = 0
+            while pos < size:
+                nxt = mm.find(b'\n>', pos)
+                rec_end = size if nxt == -1 else nxt + 1
+                hdr_end = mm.find(b'\n', pos, rec_end)
+                header = mm[pos:rec_end if hdr_end == -1 else hdr_end]
+                if header[:1] == b'>' and not kos.isdisjoint(_HEADER_KO_RE.findall(header)):
+                    if spans and spans[-1][1] == pos:
+                        spans[-1] = (spans[-1][0], rec_end)
+                    else:
+                        spans.append((pos, rec_end))
+                pos = rec_end
+    return spans
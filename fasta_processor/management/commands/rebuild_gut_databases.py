@@ -0,0 +1,21 @@
+"""
+Django management command to rebuild the gut database and gut HMM subset.
+"""
+from django.core.management.base import BaseCommand
+from fasta_processor.services import EggnogProcessor
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the gut DIAMOND database and gut HMM subset even if their build metadata is current'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔁 Rebuilding gut database and HMM subset...')
+        
+        paths = EggnogProcessor.initialize_databases(force_rebuild=True)
+        
+        if paths:
+            self.stdout.write(self.style.SUCCESS('✅ Gut databases rebuilt'))
+            self.stdout.write(f'   Gut DB: {paths["gut_db_path"]}')
+            self.stdout.write(f'   HMM profiles: {paths["profiles_hmm"]}')
+        else:
+            self.stdout.write(self.style.ERROR('❌ Rebuild failed - check the logs for details'))
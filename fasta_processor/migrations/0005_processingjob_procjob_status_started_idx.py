@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-16 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fasta_processor', '0004_processingjob_tpm_file_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='processingjob',
+            index=models.Index(fields=['status', 'started_at'], name='procjob_status_started_idx'),
+        ),
+    ]
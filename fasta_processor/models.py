@@ -64,6 +64,10 @@ class ProcessingJob(models.Model):
         ordering = ['-started_at']
         verbose_name = 'Processing Job'
         verbose_name_plural = 'Processing Jobs'
+        indexes = [
+            # Queue lookups: running jobs by start time, oldest pending job
+            models.Index(fields=['status', 'started_at'], name='procjob_status_started_idx'),
+        ]
     
     def __str__(self):
         return f"Job {self.id} - {self.fasta_file.original_filename} - {self.status}"
@@ -4,16 +4,19 @@ MERGED_CSV = r"{MERGED_CSV}"
 INPUT_FASTA = r"{INPUT_FASTA}"
 OUTPUT_FASTA = r"{OUTPUT_FASTA}"
 
-df = pd.read_csv(MERGED_CSV)
+# Only the protein IDs are needed; skip tokenising the annotation columns
+df = pd.read_csv(MERGED_CSV, usecols=["protein_id"], dtype=str)
 
-annotated = set(df["protein_id"].dropna().astype(str))
+annotated = set(df["protein_id"].dropna())
+# Bytes keys: the FASTA is copied in binary, without decoding sequence lines
+annotated_ids = {pid.encode("utf-8") for pid in annotated}
 
-with open(INPUT_FASTA) as fin, open(OUTPUT_FASTA,"w") as fout:
+with open(INPUT_FASTA, "rb", buffering=1 << 20) as fin, open(OUTPUT_FASTA, "wb", buffering=1 << 20) as fout:
     keep = False
     for line in fin:
-        if line.startswith(">"):
-            pid = line[1:].split()[0]
-            keep = pid in annotated
+        if line[:1] == b">":
+            pid = line[1:].split(None, 1)[0]
+            keep = pid in annotated_ids
         if keep:
             fout.write(line)
 
@@ -0,0 +1,47 @@
+"""
+Template for turning hmmsearch output into the KofamScan KO table.
+Parses the HMMER hit rows and writes the KO table in one pass
+(no intermediate converted-results file).
+"""
+import re
+import pandas as pd
+
+INPUT_FILE = r"{INPUT_FILE}"
+OUTPUT_FILE = r"{OUTPUT_FILE}"
+
+KO_RE = re.compile(r'(K\d{5})')
+
+rows = []
+current_ko = None
+
+with open(INPUT_FILE) as f:
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Detect KO being searched
+        if "Query:" in line or "Accession:" in line:
+            m = KO_RE.search(line)
+            if m:
+                current_ko = m.group(1)
+            continue
+
+        # Match real HMMER hit rows (stop splitting before the free-text description)
+        cols = line.split(None, 9)
+        if current_ko and len(cols) >= 9:
+            try:
+                float(cols[0])  # E-value
+                rows.append((cols[8], current_ko, abs(float(cols[1]))))
+            except ValueError:
+                pass
+
+print("Hits:", len(rows))
+
+df = pd.DataFrame(rows, columns=["protein_id", "kegg_ko_kofam", "hmm_score"])
+if len(df) == 0:
+    print("⚠️  No KofamScan hits found in input file")
+
+df.to_csv(OUTPUT_FILE, index=False)
+
+print(f"✅ KofamScan KO table created: {len(df)} entries")
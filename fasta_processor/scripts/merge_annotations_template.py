@@ -2,6 +2,7 @@
 Template for merging eggNOG and KofamScan results.
 This script creates the standardized annotation schema (FROZEN).
 """
+import numpy as np
 import pandas as pd
 import re
 
@@ -63,22 +64,16 @@ merged = merged.rename(columns={
 # HIGH: eggNOG + KofamScan agree on KO
 # MEDIUM: Only one source matches
 # LOW: Neither or conflicting
-def calculate_confidence(row):
-    has_eggnog = pd.notna(row.get("kegg_ko")) and row.get("kegg_ko") != "-"
-    has_kofam = pd.notna(row.get("kegg_ko_kofam")) and row.get("kegg_ko_kofam") != "-"
-    
-    if has_eggnog and has_kofam:
-        # Check if they agree
-        if str(row.get("kegg_ko", "")).strip() == str(row.get("kegg_ko_kofam", "")).strip():
-            return "HIGH"  # Both agree
-        else:
-            return "MEDIUM"  # Both present but disagree
-    elif has_eggnog or has_kofam:
-        return "MEDIUM"  # Only one source
-    else:
-        return "LOW"  # Neither
-
-merged["confidence_score"] = merged.apply(calculate_confidence, axis=1)
+has_eggnog = merged["kegg_ko"].notna() & (merged["kegg_ko"] != "-")
+has_kofam = merged["kegg_ko_kofam"].notna() & (merged["kegg_ko_kofam"] != "-")
+kos_agree = merged["kegg_ko"].astype(str).str.strip() == merged["kegg_ko_kofam"].astype(str).str.strip()
+
+merged["confidence_score"] = np.select(
+    [has_eggnog & has_kofam & kos_agree,  # Both agree
+     has_eggnog | has_kofam],             # Only one source, or both present but disagree
+    ["HIGH", "MEDIUM"],
+    default="LOW"                         # Neither
+)
 
 # 5. Set annotation_source
 merged["annotation_source"] = "eggnog"
@@ -10,9 +10,8 @@ ENZYMES_CSV = r"{ENZYMES_CSV}"
 PATHWAY_DEFS = r"{PATHWAY_DEFS}"
 OUTPUT_FILE = r"{OUTPUT_FILE}"
 
-# Load enzyme data
-enzymes = pd.read_csv(ENZYMES_CSV)
-print(f"Loaded {len(enzymes)} enzyme annotations")
+# Enzyme rows are streamed in chunks; only the KO -> max TPM map is kept in memory
+CHUNKSIZE = 100000
 
 # Load pathway definitions
 pathways = pd.read_csv(PATHWAY_DEFS, quotechar='"', skipinitialspace=True)
@@ -21,21 +20,36 @@ print(f"Loaded {len(pathways)} pathway definitions")
 has_metadata = 'display_name' in pathways.columns
 
 # ─────────────────────────────────────────────────────────────
-# Pre-build KO → max TPM_norm map (FAST, O(N))
+# Pre-build KO → max TPM_norm map (FAST, O(N), chunked)
 # ─────────────────────────────────────────────────────────────
 ko_global_tpm = {}
-
-for _, row in enzymes.iterrows():
-    kegg_ko_str = str(row.get("KEGG_KO", ""))
-    if pd.isna(kegg_ko_str) or kegg_ko_str in ("", "-"):
-        continue
-
-    kos = [k.strip() for k in kegg_ko_str.split(",") if k.strip()]
-    tpm = float(row.get("TPM_norm", 0))
-
-    for ko in kos:
-        if ko not in ko_global_tpm or tpm > ko_global_tpm[ko]:
-            ko_global_tpm[ko] = tpm
+n_annotations = 0
+
+enzyme_columns = pd.read_csv(ENZYMES_CSV, nrows=0).columns
+usecols = [c for c in ("KEGG_KO", "TPM_norm") if c in enzyme_columns]
+
+if "KEGG_KO" in usecols:
+    for chunk in pd.read_csv(ENZYMES_CSV, usecols=usecols, dtype={"KEGG_KO": str}, chunksize=CHUNKSIZE):
+        n_annotations += len(chunk)
+        chunk = chunk[chunk["KEGG_KO"].notna() & ~chunk["KEGG_KO"].isin(["", "-"])]
+        if chunk.empty:
+            continue
+
+        kos = chunk["KEGG_KO"].str.split(",").explode().str.strip()
+        if "TPM_norm" in chunk.columns:
+            tpm = pd.to_numeric(chunk["TPM_norm"], errors="coerce")
+        else:
+            tpm = pd.Series(0.0, index=chunk.index)
+        ko_tpm = pd.DataFrame({"ko": kos, "tpm": tpm.reindex(kos.index)})
+        ko_tpm = ko_tpm[ko_tpm["ko"] != ""]
+
+        for ko, value in ko_tpm.groupby("ko")["tpm"].max().items():
+            if ko not in ko_global_tpm or value > ko_global_tpm[ko]:
+                ko_global_tpm[ko] = value
+else:
+    n_annotations = sum(len(chunk) for chunk in pd.read_csv(ENZYMES_CSV, chunksize=CHUNKSIZE))
+
+print(f"Loaded {n_annotations} enzyme annotations")
 
 results = []
 
@@ -18,10 +18,9 @@ if os.path.getsize(DIAMOND_HITS) == 0:
     print(f"⚠️  DIAMOND hits file is empty, creating empty output")
     exit(0)
 
-hits_df = pd.read_csv(DIAMOND_HITS, sep='\t', header=None, 
-                     names=['qseqid', 'sseqid', 'pident', 'length', 'mismatch', 
-                            'gapopen', 'qstart', 'qend', 'sstart', 'send', 
-                            'evalue', 'bitscore', 'qcovhsp', 'scovhsp'])
+# Only query/subject IDs are used - skip parsing the numeric columns
+hits_df = pd.read_csv(DIAMOND_HITS, sep='\t', header=None, usecols=[0, 1],
+                      names=['qseqid', 'sseqid'], dtype=str, engine='c')
 
 # Check if DataFrame is empty
 if len(hits_df) == 0:
@@ -31,27 +30,24 @@ if len(hits_df) == 0:
     print(f"⚠️  No DIAMOND hits found, creating empty output")
     exit(0)
 
-# Try to load ko2genes mapping if available
-ko_map = {}
+# Several HSPs per query/subject pair map to the same KO
+hits_df = hits_df.drop_duplicates()
+
+# Try to load ko2genes mapping if available (gene -> first KO listed for it)
+ko_map = None
 if KO2GENES_FILE and KO2GENES_FILE != "None":
     try:
-        with open(KO2GENES_FILE, 'r') as f:
-            for line in f:
-                if line.strip() and not line.startswith('#'):
-                    parts = line.strip().split('\t')
-                    if len(parts) >= 2:
-                        ko = parts[0]
-                        gene = parts[1]
-                        if gene not in ko_map:
-                            ko_map[gene] = []
-                        ko_map[gene].append(ko)
+        ko_df = pd.read_csv(KO2GENES_FILE, sep='\t', header=None, usecols=[0, 1],
+                            names=['ko', 'gene'], dtype=str, comment='#', engine='c')
+        ko_df = ko_df.dropna()
+        ko_map = ko_df.drop_duplicates('gene').set_index('gene')['ko']
     except FileNotFoundError:
         print(f"Warning: ko2genes.txt not found at {KO2GENES_FILE}, using fallback extraction")
 
 # Map subject IDs to KOs
-if ko_map:
+if ko_map is not None and len(ko_map) > 0:
     # Use ko2genes mapping
-    hits_df['kegg_ko'] = hits_df['sseqid'].map(lambda x: ko_map.get(x, [None])[0] if x in ko_map else None)
+    hits_df['kegg_ko'] = hits_df['sseqid'].map(ko_map)
 else:
     # Fallback: Extract KO from subject ID (format: KO|protein_id or similar)
     hits_df['kegg_ko'] = hits_df['sseqid'].str.extract(r'(K\d{5})')[0]
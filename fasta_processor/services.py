@@ -2,24 +2,69 @@
 Service layer for integrating with eggnog database processing
 """
 import os
+import re
 import subprocess
 import sys
 import time
 import shutil
 import logging
+import mmap
+import multiprocessing
 import signal
+import stat
+import struct
 import atexit
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
+import selectors
+import shlex
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import timedelta
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
 from django.utils import timezone
 from .models import FastaFile, ProcessingJob
+from .fasta_scan import fadvise, ko_record_spans, record_ranges, scan_ko_shard
+
+# POSIX-only: job-runner lock (falls back to the database check elsewhere)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Optional: in-process HMMER bindings (enabled with FASTA_PROCESSING_USE_PYHMMER)
+try:
+    import pyhmmer
+except ImportError:
+    pyhmmer = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Global process registry for cleanup on server shutdown
-_active_processes = set()
+# Global process registry for cleanup on server shutdown: process -> its own process group
+# id (started with start_new_session=True) or None when it shares ours
+_active_processes = {}
+
+# Marker for per-instance caches that have not been computed yet
+_UNSET = object()
+
+
+def _signal_process(process, sig, pgid):
+    """Send sig to the process's own group (bash wrapper and the tool it runs) or just to it"""
+    try:
+        if pgid is not None:
+            os.killpg(pgid, sig)
+        else:
+            process.send_signal(sig)
+    except ProcessLookupError:
+        pass
 
 
 def _cleanup_all_processes():
@@ -28,19 +73,30 @@ def _cleanup_all_processes():
         return
     
     logger.info(f"🛑 Server shutting down - terminating {len(_active_processes)} active processes...")
-    for process in list(_active_processes):
+    # SIGTERM everything at once, then share a single 5 second grace period
+    running = {}
+    for process, pgid in list(_active_processes.items()):
         try:
             if process.poll() is None:  # Process still running
                 logger.info(f"   Terminating process PID {process.pid}")
-                process.terminate()
-                # Wait up to 5 seconds for graceful shutdown
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # Force kill if it doesn't terminate
-                    logger.warning(f"   Force killing process PID {process.pid}")
-                    process.kill()
-                    process.wait()
+                _signal_process(process, signal.SIGTERM, pgid)
+                running[process] = pgid
+        except Exception as e:
+            logger.warning(f"   Error terminating process: {e}")
+    
+    deadline = time.monotonic() + 5
+    while running and time.monotonic() < deadline:
+        for process in [p for p in running if p.poll() is not None]:
+            del running[process]
+        if running:
+            time.sleep(0.05)
+    
+    # Force kill whatever did not terminate
+    for process, pgid in running.items():
+        try:
+            logger.warning(f"   Force killing process PID {process.pid}")
+            _signal_process(process, signal.SIGKILL, pgid)
+            process.wait()
         except Exception as e:
             logger.warning(f"   Error terminating process: {e}")
     
@@ -54,13 +110,424 @@ atexit.register(_cleanup_all_processes)
 
 def _register_process(process):
     """Register a process for cleanup on server shutdown"""
-    _active_processes.add(process)
+    try:
+        pgid = os.getpgid(process.pid)
+    except (AttributeError, OSError):
+        pgid = None
+    # Only signal whole groups the process leads - never our own
+    _active_processes[process] = pgid if pgid == process.pid else None
     return process
 
 
 def _unregister_process(process):
     """Unregister a process (when it completes)"""
-    _active_processes.discard(process)
+    _active_processes.pop(process, None)
+
+
+# Proteome FASTA files at least this large are scanned in parallel shards
+_PARALLEL_SCAN_MIN_BYTES = 256 * 1024 * 1024
+
+# tmpfs options for the RAM disk that holds DIAMOND databases (huge=always is tried first)
+_RAMDISK_MOUNT_OPTS = 'size=10G,noatime'
+
+# Files hmmpress writes next to an HMM database
+_HMM_INDEX_SUFFIXES = ('.h3f', '.h3i', '.h3m', '.h3p')
+
+# DIAMOND .dmnd header: magic, build, db_version, sequence count
+_DIAMOND_HEADER = struct.Struct('<QIIQ')
+_DIAMOND_MAGIC = 0x24af8a415ee186d
+
+
+def _remove_files(paths):
+    """Remove files, ignoring ones that do not exist (like `rm -f`)"""
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+# Shared pool for independent blocking work (database setup steps, result extraction);
+# persistent, so threads are not created and torn down per call
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='eggnog-io')
+
+# App directory (KO list, pathway definitions) and script templates, resolved once at import
+_APP_DIR = Path(__file__).parent
+_SCRIPTS_DIR = _APP_DIR / "scripts"
+# KO list the gut databases are built from (already a Linux path - no translation needed)
+_KO_LIST_FILE = str(_APP_DIR / "your_24_pathways_kos.txt")
+
+
+@functools.lru_cache(maxsize=32)
+def _read_template(path_str):
+    """Read a script template once per process (templates ship with the code)"""
+    with open(path_str, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+
+# Roots that are always Linux paths (checked with one precompiled match)
+_LINUX_PATH_RE = re.compile(r'^/(?:home|usr|opt|mnt|tmp|var)/')
+
+
+@functools.lru_cache(maxsize=1024)
+def _wsl_path_str(path_str):
+    """Convert a path string to Linux format (see EggnogProcessor._to_wsl_path)"""
+    # Normalize backslashes to forward slashes
+    path_str = path_str.replace('\\', '/')
+    
+    # Already a Linux path: a known root, or absolute with no drive letter
+    if _LINUX_PATH_RE.match(path_str) or (path_str.startswith('/') and ':' not in path_str):
+        return path_str
+    
+    # Handle Windows paths (C:\Users\... -> /mnt/c/Users/...)
+    # This is for compatibility if paths come from Windows
+    drive, sep, rest = path_str.partition(':')
+    if sep:
+        return f"/mnt/{drive.lower().strip()}/{rest.lstrip('/')}"
+    
+    # If all else fails, return normalized path
+    return path_str
+
+
+# Drive-letter path (C:/... or C:...): drive, then the rest without leading slashes
+_DRIVE_RE = re.compile(r'([^:]*):/*(.*)', re.DOTALL)
+
+
+@functools.lru_cache(maxsize=256)
+def _normalize_path_str(path_str):
+    """Normalize a path string to Linux format (see EggnogProcessor._normalize_path_to_wsl)"""
+    normalized = path_str.replace('\\', '/')
+    
+    # Already WSL path
+    if path_str.startswith(('/home/', '/mnt/', '/usr/', '/opt/')):
+        return normalized
+    
+    # Windows path - simple conversion (C: -> /mnt/c)
+    m = _DRIVE_RE.match(normalized)
+    if m:
+        return f"/mnt/{m.group(1).lower()}/{m.group(2)}"
+    return normalized
+
+
+_CONDA_SH = '~/miniconda3/etc/profile.d/conda.sh'
+
+
+def _conda_prefix(env_name):
+    """
+    Shell prefix that makes a conda env's tools available to a command.
+    
+    Puts the env's bin directory first on PATH (with CONDA_PREFIX set), which is all
+    the pipeline's tools need from `conda activate`, so commands do not source
+    conda.sh. Envs with activation scripts (etc/conda/activate.d) may set more than
+    that, so they - and envs that are not found - use `source conda.sh && conda activate`.
+    
+    Args:
+        env_name: Conda environment name (e.g. 'eggnog', 'kofamscan')
+        
+    Returns:
+        str: Prefix ending in '&& ', to be placed before the command
+    """
+    env_root = Path.home() / 'miniconda3'
+    if env_name != 'base':
+        env_root = env_root / 'envs' / env_name
+    if not (env_root / 'bin').is_dir() or any((env_root / 'etc' / 'conda' / 'activate.d').glob('*.sh')):
+        return f"source {_CONDA_SH} && conda activate {env_name} && "
+    env_root = shlex.quote(str(env_root))
+    return f'export PATH={env_root}/bin:"$PATH" CONDA_PREFIX={env_root} CONDA_DEFAULT_ENV={env_name} && '
+
+# Minimum seconds between progress_message UPDATEs while a tool runs (the log line is not throttled)
+_PROGRESS_MESSAGE_MIN_INTERVAL = 30
+
+# Log files for stuck processes can be huge; only the tail is ever logged
+_LOG_TAIL_BYTES = 10 * 1024 * 1024
+
+# Script template output is only logged as a short tail (stdout[-500:], stderr[-1000:])
+_SCRIPT_OUTPUT_TAIL_BYTES = 64 * 1024
+
+
+def _read_log_tail(path, max_bytes=_LOG_TAIL_BYTES):
+    """
+    Read (the tail of) a log file as text.
+    
+    Reads bytes and decodes once with errors='replace', so binary garbage flushed
+    by tools does not raise. Returns '' if the file does not exist.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > max_bytes:
+                f.seek(-max_bytes, os.SEEK_END)
+            data = f.read()
+    except FileNotFoundError:
+        return ''
+    return data.decode('utf-8', errors='replace')
+
+
+def _sh(cmd, timeout, capture=True):
+    """
+    Run a short bash command, keeping its combined output as raw bytes.
+    
+    Output is not decoded here: callers decode only the slice they log, and with
+    capture=False it is discarded without passing through Python at all.
+    
+    Returns:
+        tuple: (returncode, stdout and stderr bytes - b'' when not captured)
+        
+    Raises:
+        subprocess.TimeoutExpired: if the command runs longer than timeout seconds
+    """
+    result = subprocess.run(
+        ['bash', '-c', cmd],
+        stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+        stderr=subprocess.STDOUT if capture else subprocess.DEVNULL,
+        timeout=timeout
+    )
+    return result.returncode, result.stdout or b''
+
+
+def _run_logged(cmd, log_path, timeout, idle_timeout=600, poll_interval=5):
+    """
+    Run a long bash command with stdout and stderr streamed straight into a log file.
+    
+    Memory stays constant however much the tool prints, and a tool that stops writing
+    output for idle_timeout seconds is treated as stalled instead of waiting out the
+    whole wall-clock timeout.
+    
+    Args:
+        cmd: Bash command line
+        log_path: File that receives the combined output (truncated first)
+        timeout: Maximum total run time in seconds
+        idle_timeout: Maximum seconds without new output (default: 600)
+        poll_interval: Seconds between liveness checks (default: 5)
+        
+    Returns:
+        subprocess.CompletedProcess: stdout holds the tail of the log, stderr is ''
+        
+    Raises:
+        subprocess.TimeoutExpired: if the command ran too long or stalled (it is killed)
+    """
+    with open(log_path, 'wb') as log:
+        process = _register_process(subprocess.Popen(
+            ['bash', '-c', cmd], stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+        ))
+    try:
+        start = last_activity = time.monotonic()
+        last_size = 0
+        while True:
+            try:
+                process.wait(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            with contextlib.suppress(OSError):
+                size = os.path.getsize(log_path)
+                if size != last_size:
+                    last_size, last_activity = size, now
+            if now - start >= timeout or now - last_activity >= idle_timeout:
+                _signal_process(process, signal.SIGKILL, _active_processes.get(process))
+                process.wait()
+                limit = timeout if now - start >= timeout else idle_timeout
+                logger.warning(f"⚠️  Killed after {'running' if limit == timeout else 'no output'} for {limit}s: {log_path}")
+                raise subprocess.TimeoutExpired(cmd, limit, output=_read_log_tail(log_path, max_bytes=_SCRIPT_OUTPUT_TAIL_BYTES))
+    finally:
+        _unregister_process(process)
+    return subprocess.CompletedProcess(cmd, process.returncode, _read_log_tail(log_path, max_bytes=_SCRIPT_OUTPUT_TAIL_BYTES), '')
+
+
+
+def _media_relative(path, media_root):
+    """
+    Return path relative to media_root for FileField names.
+    
+    Plain prefix check instead of Path.relative_to, which raises ValueError
+    when the path lies outside MEDIA_ROOT; such paths are returned unchanged.
+    """
+    p = os.path.normpath(str(path))
+    r = os.path.normpath(str(media_root))
+    return p[len(r) + 1:] if p.startswith(r + os.sep) else p
+
+
+# Built databases/indexes do not disappear while the server runs; re-probe at most this often
+_PATH_CACHE_TTL = 300
+_path_cache = {}
+
+
+def _cached_path_result(method):
+    """
+    Cache a database/index setup method's result per arguments for _PATH_CACHE_TTL seconds,
+    shared by all processors in this process. Falsy results (failures) are not cached,
+    so a missing database is retried on the next call.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__,) + args
+        cached = _path_cache.get(key)
+        if cached is not None and time.time() - cached[1] < _PATH_CACHE_TTL:
+            return cached[0]
+        result = method(self, *args)
+        if result:
+            _path_cache[key] = (result, time.time())
+        return result
+    return wrapper
+
+
+# hmmsearch messages that mean the HMM database file could not be opened (one scan of the log)
+_KOFAM_DB_ACCESS_RE = re.compile(r'not found|File existence')
+
+# DIAMOND reports e.g. "Processing query block 1, reference block 3/8, shape 2/2."
+_DIAMOND_BLOCK_RE = re.compile(r'reference block (\d+)/(\d+)(?:, shape (\d+)/(\d+))?')
+
+
+def _parse_diamond_progress(line):
+    """Percent of DIAMOND reference blocks/shapes started, or None for other lines"""
+    m = _DIAMOND_BLOCK_RE.search(line)
+    if not m:
+        return None
+    block, blocks = int(m.group(1)), int(m.group(2))
+    shape, shapes = (int(m.group(3)), int(m.group(4))) if m.group(3) else (1, 1)
+    if blocks <= 0 or shapes <= 0:
+        return None
+    return min(100.0, ((block - 1) + (shape - 1) / shapes) / blocks * 100)
+
+
+# Environment variable carrying the server's initialized database paths to job processes
+_INITIALIZED_PATHS_ENV = 'GUT_PIPELINE_INITIALIZED_PATHS'
+
+# Initialized database paths (with size/mtime of each database file), kept in eggnog_db_path
+# so processes that did not run initialize_databases() can reuse them after a few stat() calls
+_PATHS_MANIFEST_NAME = '.pipeline_manifest.json'
+
+# Host-wide job-runner lock (see _job_lock_path): held by the dispatcher, then by the job process
+# it spawns (inherited fd), and released by the kernel when that process exits - even if it crashes
+_JOB_LOCK_FD_ENV = 'GUT_PIPELINE_JOB_LOCK_FD'
+
+# A lock holder whose job started this long ago is stuck (same limit as the database check);
+# one whose job was already reset (no longer 'running') is stuck after the views' 3 hours
+_JOB_LOCK_STALE_AFTER = timedelta(hours=6)
+_JOB_LOCK_RESET_AFTER = timedelta(hours=3)
+
+
+def _job_lock_path():
+    """Job-runner lock file: FASTA_PROCESSING_JOB_LOCK_FILE, or job_runner.lock in MEDIA_ROOT"""
+    return Path(getattr(settings, 'FASTA_PROCESSING_JOB_LOCK_FILE', Path(settings.MEDIA_ROOT) / 'job_runner.lock'))
+
+
+def _try_acquire_job_lock():
+    """
+    Try to take the job-runner lock without blocking.
+    
+    Returns:
+        Open file descriptor holding the lock, or None if another job holds it
+    """
+    lock_path = _job_lock_path()
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    # Holder unknown until a job process is spawned (see _write_job_lock_holder)
+    os.ftruncate(fd, 0)
+    return fd
+
+
+def _write_job_lock_holder(fd, pid, job_id):
+    """Record the job process holding the lock, so a stuck holder can be identified and stopped"""
+    try:
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, json.dumps({'pid': pid, 'job_id': job_id}).encode('utf-8'), 0)
+    except OSError as e:
+        logger.warning(f"Queue: Could not record job lock holder: {e}")
+
+
+def _is_job_lock_holder(pid, job_id):
+    """
+    Check that pid is still the process_fasta_job process started for job_id.
+    
+    The recorded PID may have exited and been reused by an unrelated process, so it must
+    lead its own session (job processes are started with start_new_session=True) and its
+    command line must be process_fasta_job for this job.
+    
+    Args:
+        pid: Process ID recorded in the lock file
+        job_id: Job ID recorded in the lock file
+        
+    Returns:
+        True only if both checks pass (False when /proc is unavailable)
+    """
+    try:
+        if os.getsid(pid) != pid:
+            return False
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            args = f.read().split(b'\0')
+    except OSError:
+        return False
+    try:
+        index = args.index(b'process_fasta_job')
+    except ValueError:
+        return False
+    return args[index + 1:index + 2] == [str(job_id).encode()]
+
+
+def _reclaim_stale_job_lock():
+    """
+    Stop a stuck job process that still holds the job-runner lock, then take the lock.
+    
+    The holder is stuck if its job started more than 6 hours ago, or more than 3 hours ago
+    and was already reset from 'running' (views.fasta_jobs marks such jobs failed). Its
+    process group gets SIGTERM (the job's shutdown handler kills its tools), then SIGKILL -
+    but only after _is_job_lock_holder confirms the recorded PID is still that job's process.
+    
+    Returns:
+        Open file descriptor holding the lock, or None if the holder is not stuck
+    """
+    try:
+        holder = json.loads(_job_lock_path().read_text(encoding='utf-8') or 'null')
+        pid, job_id = int(holder['pid']), holder['job_id']
+    except (OSError, ValueError, TypeError, KeyError):
+        # Lock just taken by a dispatcher that has not spawned its job yet
+        return None
+    
+    job = ProcessingJob.objects.filter(id=job_id).values('status', 'started_at').first()
+    now = timezone.now()
+    if job and job['started_at']:
+        age = now - job['started_at']
+        if age < _JOB_LOCK_RESET_AFTER or (job['status'] == 'running' and age < _JOB_LOCK_STALE_AFTER):
+            return None
+    
+    if not _is_job_lock_holder(pid, job_id):
+        logger.warning(f"Queue: Job lock is held, but PID {pid} is not job {job_id}'s process - not stopping it")
+        return None
+    
+    logger.warning(f"Queue: Job {job_id} (PID {pid}) is stuck but still holds the job lock - stopping it")
+    for sig, grace in ((signal.SIGTERM, 10), (signal.SIGKILL, 2)):
+        try:
+            # Job processes are started in their own session, so the PID is also the group ID
+            os.killpg(pid, sig)
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            logger.warning(f"Queue: Could not signal stuck job process {pid}: {e}")
+            return None
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline:
+            fd = _try_acquire_job_lock()
+            if fd is not None:
+                return fd
+            time.sleep(0.2)
+    return None
+
+
+def _release_inherited_job_lock():
+    """Release the job-runner lock inherited from the dispatcher (job processes only)."""
+    inherited_fd = os.environ.pop(_JOB_LOCK_FD_ENV, None)
+    if inherited_fd is None:
+        return
+    try:
+        os.close(int(inherited_fd))
+    except (ValueError, OSError):
+        pass
 
 
 def start_next_job_in_queue():
@@ -71,18 +538,44 @@ def start_next_job_in_queue():
     Returns:
         ProcessingJob instance if started, None if no job to start or one already running
     """
-    # Check if any job is currently running (not stuck)
-    running_jobs = ProcessingJob.objects.filter(status='running')
-    
-    # Filter out stuck jobs (running for more than 6 hours)
-    active_running = running_jobs.filter(
-        started_at__gt=timezone.now() - timedelta(hours=6)
-    )
+    if fcntl is not None:
+        # A finishing job process hands the lock back before dispatching the next job
+        _release_inherited_job_lock()
+        job_lock_fd = _try_acquire_job_lock()
+        if job_lock_fd is None:
+            job_lock_fd = _reclaim_stale_job_lock()
+        if job_lock_fd is None:
+            logger.info("Queue: A job is currently running. Waiting for completion...")
+            return None  # Don't start new job, one is already running
+    else:
+        job_lock_fd = None
+        # No flock available: check for running jobs (not stuck, i.e. under 6 hours) in one query
+        active_running = ProcessingJob.objects.filter(
+            status='running',
+            started_at__gt=timezone.now() - timedelta(hours=6)
+        ).aggregate(count=Count('id'))['count']
+        if active_running:
+            logger.info(f"Queue: {active_running} job(s) currently running. Waiting for completion...")
+            return None  # Don't start new job, one is already running
     
-    if active_running.exists():
-        logger.info(f"Queue: {active_running.count()} job(s) currently running. Waiting for completion...")
-        return None  # Don't start new job, one is already running
+    try:
+        return _dispatch_next_job(job_lock_fd)
+    finally:
+        # The spawned job process keeps its own copy of the locked descriptor
+        if job_lock_fd is not None:
+            os.close(job_lock_fd)
+
+
+def _dispatch_next_job(job_lock_fd):
+    """
+    Spawn process_fasta_job for the oldest pending job.
     
+    Args:
+        job_lock_fd: Descriptor holding the job-runner lock, passed on to the job process (or None)
+        
+    Returns:
+        ProcessingJob instance if started, None otherwise
+    """
     # Get the oldest pending job
     next_job = ProcessingJob.objects.filter(status='pending').order_by('started_at').first()
     
@@ -96,22 +589,35 @@ def start_next_job_in_queue():
     # Start processing in background
     manage_py = Path(settings.BASE_DIR) / 'manage.py'
     
+    # Hand the server's pre-initialized database paths to the job process so it does not
+    # repeat initialize_databases() (the class-level cache does not survive the exec)
+    env = os.environ.copy()
+    if EggnogProcessor._initialized_paths['initialized']:
+        env[_INITIALIZED_PATHS_ENV] = json.dumps(EggnogProcessor._initialized_paths)
+    if job_lock_fd is not None:
+        env[_JOB_LOCK_FD_ENV] = str(job_lock_fd)
+    
     try:
         if sys.platform == 'win32':
             subprocess.Popen(
                 [sys.executable, str(manage_py), 'process_fasta_job', str(next_job.id)],
                 stdout=None,
                 stderr=None,
+                env=env,
                 creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
                 close_fds=False
             )
         else:
-            subprocess.Popen(
+            job_process = subprocess.Popen(
                 [sys.executable, str(manage_py), 'process_fasta_job', str(next_job.id)],
                 stdout=None,
                 stderr=None,
+                env=env,
+                pass_fds=(job_lock_fd,) if job_lock_fd is not None else (),
                 start_new_session=True
             )
+            if job_lock_fd is not None:
+                _write_job_lock_holder(job_lock_fd, job_process.pid, next_job.id)
         logger.info(f"Queue: Successfully started job {next_job.id} in background")
         return next_job
     except Exception as e:
@@ -155,9 +661,18 @@ class EggnogProcessor:
         
         # Normalize kofam_db_path to Linux format
         self.kofam_db_path = self._normalize_path_to_wsl(self.kofam_db_path)
+        
+        # RAM disk status does not change mid-pipeline - probe it once per instance
+        self._ramdisk_path = _UNSET
+        
+        # (profiles_hmm path, loaded pyhmmer HMMs) - parsed once per instance
+        self._pyhmmer_profiles = None
+        
+        # Rebuild derived databases even if their .meta sidecars say they are current
+        self._force_rebuild = False
     
     @classmethod
-    def initialize_databases(cls, eggnog_db_path=None, kofam_db_path=None):
+    def initialize_databases(cls, eggnog_db_path=None, kofam_db_path=None, force_rebuild=False):
         """
         Initialize all databases at server startup (runs ONCE, not per job).
         This is the critical fix - moves heavy operations from job-time to boot-time.
@@ -165,21 +680,42 @@ class EggnogProcessor:
         Args:
             eggnog_db_path: Path to eggnog_db_final folder
             kofam_db_path: Path to kofam_db folder
+            force_rebuild: Rebuild the gut database and HMM subset even if they are current
             
         Returns:
             dict with initialized paths or None if failed
         """
-        if cls._initialized_paths['initialized']:
+        if cls._initialized_paths['initialized'] and not force_rebuild:
             logger.info("✅ Databases already initialized (skipping)")
             return cls._initialized_paths
         
         logger.info("🚀 Initializing databases at server startup (this runs ONCE)...")
         
         processor = cls(eggnog_db_path, kofam_db_path)
+        if not force_rebuild:
+            manifest_paths = processor._load_paths_manifest()
+            if manifest_paths:
+                cls._initialized_paths = manifest_paths
+                logger.info("✅ Databases unchanged since the last initialization (manifest is current)")
+                return cls._initialized_paths
+        if force_rebuild:
+            logger.info("🔁 Forced rebuild of gut database and HMM subset requested")
+            processor._force_rebuild = True
+            _path_cache.clear()
         eggnog_db_wsl = processor.eggnog_db_path
         kofam_db_wsl = processor.kofam_db_path
         
         try:
+            # STEPS 3-4 (hmmfetch/hmmpress, integrity check) and the RAM disk mount do not depend
+            # on the gut database: start them on the shared pool so initialization takes as long
+            # as the slowest step rather than the sum
+            eggnog_proteins_dmnd = f"{eggnog_db_wsl}/eggnog_proteins.dmnd"
+            logger.info("📦 Step 3/4: Creating gut HMM subset (in background)...")
+            hmm_subset_future = _IO_POOL.submit(processor._create_gut_hmm_subset, kofam_db_wsl, eggnog_db_wsl)
+            logger.info("📦 Step 4/4: Validating full eggNOG database (in background)...")
+            db_sanity_future = _IO_POOL.submit(processor._quick_db_sanity, eggnog_proteins_dmnd)
+            ramdisk_future = _IO_POOL.submit(processor._setup_ramdisk)
+            
             # STEP 1: Build gut database (clean method)
             logger.info("📦 Step 1/4: Building clean gut database...")
             gut_db_path = processor._ensure_gut_database(eggnog_db_wsl)
@@ -189,24 +725,26 @@ class EggnogProcessor:
             
             # STEP 2: Setup RAM disk and copy gut database
             logger.info("📦 Step 2/4: Setting up RAM disk...")
-            ramdisk_path = processor._setup_ramdisk()
+            ramdisk_path = ramdisk_future.result()
             gut_db_ramdisk = None
             if ramdisk_path and gut_db_path:
                 logger.info("📦 Step 2/4: Copying gut database to RAM disk...")
                 gut_db_ramdisk = processor._copy_to_ramdisk(gut_db_path, ramdisk_path)
             
-            # STEP 3: Create gut HMM subset
-            logger.info("📦 Step 3/4: Creating gut HMM subset...")
-            profiles_hmm = processor._create_gut_hmm_subset(kofam_db_wsl, eggnog_db_wsl)
+            # STEP 3: Gut HMM subset (started above)
+            profiles_hmm = hmm_subset_future.result()
             
             # STEP 4: Validate full eggNOG database exists (just check, don't rebuild)
-            logger.info("📦 Step 4/4: Validating full eggNOG database...")
-            eggnog_proteins_dmnd = f"{eggnog_db_wsl}/eggnog_proteins.dmnd"
-            check_db_cmd = f"test -f {eggnog_proteins_dmnd} && test -s {eggnog_proteins_dmnd} && echo 'exists' || echo 'missing'"
-            db_check = subprocess.run(['bash', '-c', check_db_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            if 'missing' in db_check.stdout:
+            db_status = db_sanity_future.result()
+            if db_status == 'missing':
                 logger.warning(f"⚠️  Full eggNOG database not found at {eggnog_proteins_dmnd}")
                 logger.warning(f"   Pipeline will skip full database search if gut DB finds all sequences")
+            elif db_status == 'mismatch':
+                logger.warning(f"⚠️  Full eggNOG database at {eggnog_proteins_dmnd} changed since its integrity record "
+                               f"(size or header/footer differ) - it may be truncated or corrupted")
+                logger.warning(f"   If DIAMOND fails, rebuild with: download_eggnog_data.py --data_dir {eggnog_db_wsl} -M -H -d 2 -y -f")
+            elif db_status == 'recorded':
+                logger.info(f"   Recorded integrity signature for {eggnog_proteins_dmnd}")
             
             # Store initialized paths
             cls._initialized_paths = {
@@ -216,6 +754,7 @@ class EggnogProcessor:
                 'profiles_hmm': profiles_hmm,
                 'initialized': True
             }
+            processor._write_paths_manifest(cls._initialized_paths)
             
             logger.info("✅ Database initialization complete!")
             logger.info(f"   - Gut DB: {gut_db_path}")
@@ -229,6 +768,93 @@ class EggnogProcessor:
             logger.exception("Database initialization error")
             return None
     
+    def _paths_manifest_files(self, paths):
+        """
+        Files whose size/mtime decide whether initialized paths are still valid: the
+        databases themselves and the inputs they are built from (a missing input is
+        recorded as None, so its later appearance also invalidates the manifest).
+        """
+        files = [
+            paths['gut_db_path'], paths['gut_db_ramdisk'], paths['profiles_hmm'],
+            _KO_LIST_FILE,
+            f"{self.eggnog_db_path}/e5.proteomes.faa",
+            f"{self.eggnog_db_path}/eggnog_proteins.fa",
+            f"{self.kofam_db_path}/profiles.hmm",
+        ]
+        return sorted({path for path in files if path})
+    
+    def _stat_manifest_files(self, paths):
+        """path -> [mtime, size] (None if missing) for _paths_manifest_files()"""
+        stats = {}
+        for path in self._paths_manifest_files(paths):
+            try:
+                st = os.stat(path)
+                stats[path] = [st.st_mtime, st.st_size]
+            except OSError:
+                stats[path] = None
+        return stats
+    
+    def _write_paths_manifest(self, paths):
+        """
+        Record initialized database paths and the size/mtime of the databases and their
+        inputs in eggnog_db_path/.pipeline_manifest.json (written to a temp file, then renamed).
+        """
+        manifest_path = os.path.join(self.eggnog_db_path, _PATHS_MANIFEST_NAME)
+        try:
+            with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({'paths': paths, 'files': self._stat_manifest_files(paths)}, f)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+        except OSError as e:
+            logger.warning(f"Could not write database manifest {manifest_path}: {e}")
+    
+    def _load_paths_manifest(self):
+        """
+        Load initialized database paths from the manifest if every listed file still has
+        its recorded size/mtime (and the RAM disk is still mounted).
+        
+        Returns:
+            dict of initialized paths, or None if the manifest is missing or stale
+        """
+        manifest_path = os.path.join(self.eggnog_db_path, _PATHS_MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            paths = manifest['paths']
+            if not paths.get('initialized') or manifest['files'] != self._stat_manifest_files(paths):
+                return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if any(manifest['files'][path] is None for path in (paths['gut_db_path'], paths['gut_db_ramdisk'])):
+            return None
+        if paths['ramdisk_path'] and not os.path.ismount(paths['ramdisk_path']):
+            return None
+        return paths
+    
+    @classmethod
+    def adopt_inherited_paths(cls):
+        """
+        Adopt database paths initialized by the parent server process.
+        
+        start_next_job_in_queue() passes them to process_fasta_job via the environment,
+        so job processes skip initialize_databases().
+        
+        Returns:
+            True if inherited paths were adopted, False otherwise
+        """
+        inherited = os.environ.get(_INITIALIZED_PATHS_ENV)
+        if not inherited:
+            return False
+        try:
+            paths = json.loads(inherited)
+        except ValueError:
+            logger.warning(f"⚠️  Ignoring malformed {_INITIALIZED_PATHS_ENV}")
+            return False
+        if not paths.get('initialized'):
+            return False
+        cls._initialized_paths = paths
+        logger.info("✅ Using database paths initialized by the server process")
+        return True
+    
     @classmethod
     def get_initialized_paths(cls):
         """Get pre-initialized database paths (fast, no disk I/O)"""
@@ -237,54 +863,86 @@ class EggnogProcessor:
             return None
         return cls._initialized_paths
     
-    def process_fasta(self, fasta_file_instance):
+    def _claim_job(self, fasta_file_instance):
         """
-        Process a FASTA file using eggnog
+        Claim the file's processing job for this process, creating it if needed.
         
         Args:
             fasta_file_instance: FastaFile model instance
             
         Returns:
-            ProcessingJob instance
+            tuple: (ProcessingJob instance, claimed) - claimed is False if the job is
+            already running elsewhere and must not be started again
         """
-        # Create or get processing job
-        job, created = ProcessingJob.objects.get_or_create(
-            fasta_file=fasta_file_instance,
-            defaults={
-                'user': fasta_file_instance.user,
-                'status': 'pending'
-            }
+        # Claim the job with one conditional UPDATE: pending/failed/completed jobs, or running
+        # jobs stuck for more than 2 hours. A job running elsewhere is never matched, so two
+        # callers cannot both start it.
+        now = timezone.now()
+        claimable = (
+            Q(status__in=['pending', 'failed', 'completed'])
+            | Q(status='running', started_at__lt=now - timedelta(hours=2))
         )
         
-        # Check if job is already running (and not stuck)
-        if not created and job.status == 'running':
-            # Check if job has been running for more than 2 hours (likely stuck)
-            if job.started_at and (timezone.now() - job.started_at) > timedelta(hours=2):
-                logger.warning(f"Job {job.id} has been running for more than 2 hours, resetting to pending")
-                job.status = 'pending'
-                job.error_message = 'Job was stuck and has been reset'
-                job.save()
+        def reset_if_failed(field_name):
+            """Clear a result field only when retrying a failed job (others keep theirs until the run ends)"""
+            return Case(
+                When(status='failed', then=Value(None)),
+                default=F(field_name),
+                output_field=ProcessingJob._meta.get_field(field_name)
+            )
+        
+        with transaction.atomic():
+            # The CASE conditions see the row as it was before the UPDATE
+            claimed = ProcessingJob.objects.filter(claimable, fasta_file=fasta_file_instance).update(
+                error_message=Case(
+                    When(status='running', then=Value('Job was stuck and has been reset')),
+                    When(status='failed', then=Value('')),
+                    default=F('error_message')
+                ),
+                result_file=reset_if_failed('result_file'),
+                completed_at=reset_if_failed('completed_at'),
+                processing_time=reset_if_failed('processing_time'),
+                status='running',
+                started_at=now,
+                progress=0,
+                progress_message='Starting processing...'
+            )
+            if claimed:
+                job = ProcessingJob.objects.get(fasta_file=fasta_file_instance)
+                logger.info(f"Claimed job {job.id} for processing")
             else:
-                logger.info(f"Job {job.id} is already running, skipping")
-                return job  # Already processing
-        
-        # Reset job if it was previously failed
-        if not created and job.status == 'failed':
-            logger.info(f"Retrying failed job {job.id}")
-            job.error_message = ''
-            job.result_file = None
-            job.completed_at = None
-            job.processing_time = None
-        
-        # Update status
-        job.status = 'running'
-        job.started_at = timezone.now()
-        job.progress = 0
-        job.progress_message = 'Starting processing...'
-        job.save()
-        
-        fasta_file_instance.status = 'processing'
-        fasta_file_instance.save()
+                # No job yet (create it already running), or it is running and not stuck
+                job, created = ProcessingJob.objects.get_or_create(
+                    fasta_file=fasta_file_instance,
+                    defaults={
+                        'user': fasta_file_instance.user,
+                        'status': 'running',
+                        'progress': 0,
+                        'progress_message': 'Starting processing...'
+                    }
+                )
+                if not created:
+                    logger.info(f"Job {job.id} is already running, skipping")
+                    return job, False
+            
+            fasta_file_instance.status = 'processing'
+            fasta_file_instance.save(update_fields=['status'])
+        
+        return job, True
+    
+    def process_fasta(self, fasta_file_instance):
+        """
+        Process a FASTA file using eggnog
+        
+        Args:
+            fasta_file_instance: FastaFile model instance
+            
+        Returns:
+            ProcessingJob instance
+        """
+        job, claimed = self._claim_job(fasta_file_instance)
+        if not claimed:
+            return job  # Already processing
         
         try:
             logger.info(f"Starting processing for file: {fasta_file_instance.original_filename} (Job ID: {job.id})")
@@ -315,7 +973,7 @@ class EggnogProcessor:
             
             # Run eggnog processing
             logger.info("Calling _run_eggnog()...")
-            result = self._run_eggnog(fasta_path, str(output_file), job)
+            result = self._run_eggnog(fasta_path, str(output_file), job, file_size_mb=file_size_mb)
             logger.info(f"_run_eggnog() returned: success={result.get('success')}, error={result.get('error', 'None')}")
             # TPM JOIN
             if result.get("success") and job.tpm_file:
@@ -348,13 +1006,16 @@ class EggnogProcessor:
                 job.progress = 100
                 job.progress_message = 'Processing completed successfully!'
                 # Use existing media_root variable (no need to recalculate)
-                job.result_file.name = str(output_file.relative_to(media_root))
+                job.result_file.name = _media_relative(output_file, media_root)
                 job.processing_time = result.get('processing_time', 0)
                 job.eggnog_version = result.get('version', 'unknown')
-                job.save()
-                
                 fasta_file_instance.status = 'completed'
-                fasta_file_instance.save()
+                with transaction.atomic():
+                    job.save(update_fields=[
+                        'status', 'completed_at', 'progress', 'progress_message',
+                        'result_file', 'processing_time', 'eggnog_version'
+                    ])
+                    fasta_file_instance.save(update_fields=['status'])
                 
                 # Log final FASTA file location if available
                 final_fasta = result.get('final_fasta_file')
@@ -398,93 +1059,214 @@ class EggnogProcessor:
         
         return job
     
-    def _extract_protein_ids_from_kofamscan(self, kofamscan_results_file):
+    def _count_fasta_records(self, fasta_path):
         """
-        Extract protein IDs from KofamScan results file.
+        Count FASTA records (lines starting with '>') without spawning grep.
         
         Args:
-            kofamscan_results_file: Path to kofamscan results file
+            fasta_path: Path to FASTA file
             
         Returns:
-            set: Set of protein IDs found by KofamScan (high confidence only)
+            int: Number of sequence headers in the file
         """
-        protein_ids = set()
+        count = 0
+        previous_byte = b'\n'  # Treat start of file as a line start
+        with open(fasta_path, 'rb') as f:
+            while True:
+                chunk = f.read(8 << 20)
+                if not chunk:
+                    break
+                count += chunk.count(b'\n>')
+                # Header split across the chunk boundary ("\n" | ">...")
+                if previous_byte == b'\n' and chunk[:1] == b'>':
+                    count += 1
+                previous_byte = chunk[-1:]
+        return count
+    
+    def _count_lines(self, path):
+        """
+        Count newline characters in a file (same result as `wc -l`) without spawning wc.
         
-        if not os.path.exists(kofamscan_results_file):
-            return protein_ids
+        Args:
+            path: Path to file
+            
+        Returns:
+            int: Number of lines in the file
+        """
+        count = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(8 << 20)
+                if not chunk:
+                    break
+                count += chunk.count(b'\n')
+        return count
+    
+    def _csv_has_data_rows(self, path):
+        """
+        Check that a CSV file has at least one non-empty row after its header.
         
-        with open(kofamscan_results_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                
-                # High confidence hits start with "*"
-                confident = line.startswith("*")
-                if confident:
-                    line = line.lstrip("* ").strip()
-                
-                parts = line.split()
-                if len(parts) >= 2:
-                    protein_id = parts[0]
-                    # Only include high confidence hits
-                    if confident:
-                        protein_ids.add(protein_id)
+        Only the first two lines are read, so the cost does not depend on file size.
         
-        logger.info(f"Extracted {len(protein_ids)} protein IDs from KofamScan results")
-        return protein_ids
+        Args:
+            path: Path to CSV file (None is treated as missing)
+            
+        Returns:
+            bool: True if a data row follows the header (False if missing or unreadable)
+        """
+        if not path:
+            return False
+        try:
+            with open(path, 'rb') as f:
+                f.readline()
+                return bool(f.readline().strip())
+        except OSError:
+            return False
     
-    def _filter_fasta_by_proteins(self, input_fasta, protein_ids_to_exclude, output_fasta):
+    def _csv_data_row_count(self, path):
         """
-        Create a filtered FASTA file excluding specified protein IDs.
+        Count data rows (lines after the header) in a CSV file.
         
         Args:
-            input_fasta: Path to input FASTA file
-            protein_ids_to_exclude: Set of protein IDs to exclude
-            output_fasta: Path to output filtered FASTA file
+            path: Path to CSV file (None is treated as missing)
             
         Returns:
-            int: Number of sequences in filtered file
+            int: Number of data rows (0 if missing or unreadable)
         """
-        excluded_count = 0
-        included_count = 0
+        if not path:
+            return 0
+        try:
+            return max(0, self._count_lines(path) - 1)
+        except OSError:
+            return 0
+    
+    def _fasta_quick_stats(self, fasta_path):
+        """
+        Characterize a FASTA file in one pass over a read-only mmap (no subprocess).
         
-        with open(input_fasta, 'r') as infile, open(output_fasta, 'w') as outfile:
-            current_seq = None
-            current_id = None
-            write_current = False
+        Args:
+            fasta_path: Path to FASTA file
             
-            for line in infile:
-                if line.startswith('>'):
-                    # Save previous sequence if needed
-                    if current_seq and write_current:
-                        outfile.write(current_seq)
-                        included_count += 1
-                    
-                    # Parse new sequence header
-                    current_id = line[1:].split()[0].strip()  # Get first word after >
-                    current_seq = line
-                    write_current = current_id not in protein_ids_to_exclude
-                    
-                    if not write_current:
-                        excluded_count += 1
-                else:
-                    if current_seq:
-                        current_seq += line
-                    else:
-                        # Handle case where file doesn't start with >
-                        current_seq = line
-                        write_current = True
+        Returns:
+            tuple: (n_seqs, n_residues, max_len)
+        """
+        n_seqs = n_residues = max_len = 0
+        with open(fasta_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return 0, 0, 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                size = len(mm)
+                pos = 0 if mm[:1] == b'>' else mm.find(b'\n>')
+                if pos > 0:
+                    pos += 1
+                while pos != -1 and pos < size:
+                    n_seqs += 1
+                    header_end = mm.find(b'\n', pos)
+                    if header_end == -1:
+                        break
+                    next_header = mm.find(b'\n>', header_end)
+                    body_end = size if next_header == -1 else next_header + 1
+                    body = mm[header_end + 1:body_end]
+                    length = len(body) - body.count(b'\n') - body.count(b'\r')
+                    n_residues += length
+                    if length > max_len:
+                        max_len = length
+                    pos = -1 if next_header == -1 else next_header + 1
+        return n_seqs, n_residues, max_len
+    
+    def _split_fasta(self, fasta_path, output_dir, n_parts):
+        """
+        Split a FASTA file into up to n_parts files of similar size, cutting only at
+        record boundaries. Byte ranges are copied with sendfile (no parsing).
+        
+        Args:
+            fasta_path: Path to FASTA file
+            output_dir: Directory for the part files (created if missing)
+            n_parts: Desired number of parts
             
-            # Write last sequence if needed
-            if current_seq and write_current:
-                outfile.write(current_seq)
-                included_count += 1
+        Returns:
+            list: Paths of the part files, in input order
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        with open(fasta_path, 'rb') as infile:
+            part_paths = []
+            for index, (start, end) in enumerate(record_ranges(fasta_path, n_parts)):
+                part_path = str(output_dir / f"part_{index}.faa")
+                with open(part_path, 'wb') as outfile:
+                    self._sendfile_range(outfile.fileno(), infile.fileno(), start, end)
+                part_paths.append(part_path)
+        return part_paths
+    
+    def _sendfile_range(self, out_fd, in_fd, start, end):
+        """Copy bytes [start, end) of in_fd to the current position of out_fd in the kernel"""
+        offset = start
+        while offset < end:
+            sent = os.sendfile(out_fd, in_fd, offset, end - offset)
+            if sent == 0:
+                break
+            offset += sent
+    
+    def _concatenate_files(self, part_paths, output_path):
+        """Concatenate part files (skipping missing ones) into output_path"""
+        with open(output_path, 'wb') as outfile:
+            for part_path in part_paths:
+                try:
+                    with open(part_path, 'rb') as infile:
+                        shutil.copyfileobj(infile, outfile, 1 << 20)
+                except FileNotFoundError:
+                    continue
+    
+    def _warm_file_cache(self, paths, ram_limit_gb=None):
+        """
+        Start kernel readahead (POSIX_FADV_WILLNEED) for database files in a background
+        thread, so they are paged in while the pipeline prepares the search.
+        
+        Files are only warmed while they fit in a quarter of the free memory (and of
+        ram_limit_gb): readahead of a file larger than that just evicts the hot databases
+        and competes with the search for disk bandwidth.
+        
+        Args:
+            paths: Files to warm (missing and oversized files are skipped)
+            ram_limit_gb: RAM available to the pipeline (FASTA_PROCESSING_RAM_GB, optional)
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
         
-        logger.info(f"Filtered FASTA: {included_count} sequences included, {excluded_count} excluded")
-        return included_count
+        try:
+            budget = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, ValueError, OSError):
+            budget = None
+        if ram_limit_gb:
+            limit = int(ram_limit_gb * 1024 ** 3)
+            budget = limit if budget is None else min(budget, limit)
+        if budget is not None:
+            budget //= 4
+        
+        def warm():
+            remaining = budget
+            for path in paths:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except OSError:
+                    continue
+                try:
+                    size = os.fstat(fd).st_size
+                    if remaining is not None and size > remaining:
+                        logger.debug(f"Not warming {path}: {size} bytes exceed the page cache budget")
+                        continue
+                    if remaining is not None:
+                        remaining -= size
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                except OSError as e:
+                    logger.debug(f"posix_fadvise failed for {path}: {e}")
+                finally:
+                    os.close(fd)
+        
+        threading.Thread(target=warm, name='db-cache-warm', daemon=True).start()
     
-    def _calculate_timeout(self, file_size_mb, tool='emapper', no_timeout=False):
+    def _calculate_timeout(self, file_size_mb, tool='emapper', no_timeout=False, residue_count=None):
         """
         Calculate timeout based on file size and tool type.
         Set no_timeout=True to disable timeouts and ensure complete results.
@@ -493,6 +1275,8 @@ class EggnogProcessor:
             file_size_mb: File size in MB
             tool: Tool name ('emapper', 'kofamscan', or 'diamond')
             no_timeout: If True, return very high timeout (24 hours) to ensure complete results
+            residue_count: Total residues from _fasta_quick_stats (optional). Search time follows
+                residues rather than bytes, so when given it replaces the file size (1 MB ~ 1M residues)
             
         Returns:
             Timeout in seconds (or very high value if no_timeout=True)
@@ -501,6 +1285,9 @@ class EggnogProcessor:
         if no_timeout:
             return 24 * 3600  # 24 hours - effectively no timeout
         
+        if residue_count is not None:
+            file_size_mb = residue_count / (1024 * 1024)
+        
         if tool == 'kofamscan':
             if file_size_mb < 0.01:  # < 10KB - very small
                 return 15 * 60  # 15 minutes
@@ -536,6 +1323,94 @@ class EggnogProcessor:
             else:
                 return 6 * 3600  # 6 hours for large files
     
+    def _run_pyhmmer_search(self, profiles_hmm, input_file, output_file, cpus, batch_size=10000, total_sequences=None):
+        """
+        Run the KofamScan HMM search in-process with pyhmmer instead of the hmmsearch binary.
+        Input sequences are read in batches to bound memory, and hits are written as an
+        hmmsearch-style per-sequence table (Query: lines + hit rows) that the
+        kofam_kos template already understands.
+        
+        Args:
+            profiles_hmm: Path to HMM profiles file
+            input_file: Path to input protein FASTA
+            output_file: Path to write hmmsearch-style results
+            cpus: Number of worker threads
+            batch_size: Sequences per batch (default 10000)
+            total_sequences: Number of sequences in input_file, if already known
+            
+        Returns:
+            tuple: (success, error_message)
+        """
+        if pyhmmer is None:
+            return False, "pyhmmer is not installed"
+        
+        try:
+            if self._pyhmmer_profiles is None or self._pyhmmer_profiles[0] != profiles_hmm:
+                with pyhmmer.plan7.HMMFile(profiles_hmm) as hmm_file:
+                    self._pyhmmer_profiles = (profiles_hmm, list(hmm_file))
+            hmms = self._pyhmmer_profiles[1]
+            if not hmms:
+                return False, f"No HMM profiles found in {profiles_hmm}"
+            
+            # Fix the database size so batched E-values match one search over the whole input
+            if total_sequences is None:
+                total_sequences = self._count_fasta_records(input_file)
+            total_sequences = max(1, total_sequences)
+            hits_written = 0
+            
+            with pyhmmer.easel.SequenceFile(input_file, digital=True, alphabet=hmms[0].alphabet) as seq_file, \
+                 open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as out:
+                while True:
+                    block = seq_file.read_block(sequences=batch_size)
+                    if not block:
+                        break
+                    # Same options as the hmmsearch command: --max (no filters) and --domE 1e-5
+                    for top_hits in pyhmmer.hmmsearch(hmms, block, cpus=cpus, Z=total_sequences, domE=1e-5,
+                                                      bias_filter=False, F1=1.0, F2=1.0, F3=1.0):
+                        reported = [hit for hit in top_hits if hit.reported]
+                        if not reported:
+                            continue
+                        query = getattr(top_hits, 'query', None)
+                        query_name = query.name if query is not None else top_hits.query_name
+                        if isinstance(query_name, bytes):
+                            query_name = query_name.decode()
+                        out.write(f"Query:       {query_name}\n")
+                        for hit in reported:
+                            best = hit.best_domain
+                            hit_name = hit.name.decode() if isinstance(hit.name, bytes) else hit.name
+                            # Same columns as hmmsearch's table; the kofam_kos template only reads the
+                            # E-value, the score and the sequence name. pyhmmer does not expose the
+                            # expected domain count (exp), so that column is written as '-'
+                            domains_reported = sum(1 for domain in hit.domains if domain.reported)
+                            out.write(f"{hit.evalue:.2g} {hit.score:.1f} {hit.bias:.1f} "
+                                      f"{best.i_evalue:.2g} {best.score:.1f} {best.bias:.1f} "
+                                      f"- {domains_reported} {hit_name}\n")
+                            hits_written += 1
+            
+            logger.info(f"pyhmmer search completed: {hits_written} hits from {len(hmms)} profiles")
+            return True, None
+        except Exception as e:
+            return False, str(e)
+    
+    def _diamond_memory_options(self, ram_limit_gb, small_db=False):
+        """
+        Size DIAMOND's --block-size / --index-chunks from the configured RAM limit.
+        DIAMOND needs roughly 6 GB of RAM per block-size unit; fewer index chunks
+        trade more memory for fewer passes over the query.
+        
+        Args:
+            ram_limit_gb: RAM available to the search (FASTA_PROCESSING_RAM_GB)
+            small_db: True for the tiny gut database, which always fits in one chunk
+            
+        Returns:
+            tuple: (block_size, index_chunks)
+        """
+        block_size = max(0.5, round(ram_limit_gb / 6.0, 1))
+        if small_db:
+            return block_size, 1
+        index_chunks = max(1, int(12 / max(ram_limit_gb, 1)))
+        return block_size, index_chunks
+    
     def _monitor_process(self, process, timeout_seconds, job=None, step_message='Processing', check_interval=60, file_size_mb=None):
         """
         Monitor a subprocess with timeout and periodic progress updates.
@@ -552,62 +1427,194 @@ class EggnogProcessor:
         Returns:
             tuple: (return_code, timed_out)
         """
+        return_codes, timed_out = self._monitor_processes(
+            [process], timeout_seconds, job=job, step_message=step_message,
+            check_interval=check_interval, file_size_mb=file_size_mb
+        )
+        return return_codes[0], timed_out
+    
+    def _monitor_processes(self, processes, timeout_seconds, job=None, step_message='Processing', check_interval=60,
+                           file_size_mb=None, stderr_logs=None, progress_parsers=None, progress_range=None):
+        """
+        Monitor several subprocesses running side by side in one event loop.
+        Returns once every process has exited; on timeout all still-running
+        processes are killed.
+        
+        Processes started with stderr=subprocess.PIPE are read through a selector as
+        output arrives: the bytes are copied to the matching stderr log and each line is
+        passed to the process's progress parser, which drives job.progress.
+        
+        Args:
+            processes: List of subprocess.Popen instances
+            timeout_seconds: Maximum time to wait for all processes
+            job: ProcessingJob instance (optional)
+            step_message: Message to display in progress updates
+            check_interval: Seconds between progress updates (default 60)
+            file_size_mb: File size in MB for optimization (optional)
+            stderr_logs: Binary file objects to copy piped stderr into, aligned with processes (optional)
+            progress_parsers: Callables line -> percent or None, aligned with processes (optional)
+            progress_range: (start, end) job.progress values the parsed percent maps onto (optional)
+            
+        Returns:
+            tuple: (list of return codes in the order given, timed_out)
+        """
         # Optimize check interval for small files - check more frequently
         if file_size_mb is not None and file_size_mb < 0.1:  # < 100KB
             check_interval = 10  # Check every 10 seconds for very small files
         elif file_size_mb is not None and file_size_mb < 1:  # < 1MB
             check_interval = 30  # Check every 30 seconds for small files
         
+        stderr_logs = stderr_logs or [None] * len(processes)
+        progress_parsers = progress_parsers or [None] * len(processes)
+        return_codes = [None] * len(processes)
+        percents = [None] * len(processes)
+        partial_lines = [b''] * len(processes)
         process_start_time = time.time()
         last_progress_update = time.time()
+        last_percent_save = 0.0
+        last_message_save = 0.0
+        
+        selector = selectors.DefaultSelector()
+        for index, process in enumerate(processes):
+            if process.stderr is not None:
+                os.set_blocking(process.stderr.fileno(), False)
+                selector.register(process.stderr, selectors.EVENT_READ, index)
+        
+        # pidfds (Linux 5.3+) become readable when the process exits, so the loop can block
+        # until an exit or the next progress/timeout deadline instead of waking every second
+        exit_watch = True
+        for process in processes:
+            try:
+                selector.register(os.pidfd_open(process.pid), selectors.EVENT_READ, None)
+            except (AttributeError, OSError):
+                exit_watch = False
+        
+        def read_stderr(index, stream):
+            """Copy available stderr bytes to the log and feed complete lines to the parser"""
+            while True:
+                try:
+                    chunk = os.read(stream.fileno(), 65536)
+                except BlockingIOError:
+                    return
+                if not chunk:
+                    selector.unregister(stream)
+                    stream.close()
+                    return
+                if stderr_logs[index] is not None:
+                    stderr_logs[index].write(chunk)
+                if progress_parsers[index] is None:
+                    continue
+                lines = re.split(rb'[\r\n]', partial_lines[index] + chunk)
+                partial_lines[index] = lines.pop()
+                for line in lines:
+                    percent = progress_parsers[index](line.decode('utf-8', errors='replace'))
+                    if percent is not None:
+                        percents[index] = percent
         
         try:
             while True:
-                return_code = process.poll()
-                if return_code is not None:
-                    # Process completed - unregister it
-                    _unregister_process(process)
-                    return return_code, False
+                # Wait for stderr output or a process exit, up to the next progress/timeout deadline
+                # (at most 1s when exits cannot be watched)
+                deadline = min(process_start_time + timeout_seconds, last_progress_update + check_interval)
+                if job and progress_range and any(percent is not None for percent in percents):
+                    # Only once a percent has been parsed - before that there is nothing to save
+                    deadline = min(deadline, last_percent_save + 5)
+                wait = max(0.0, deadline - time.time())
+                if not exit_watch:
+                    wait = min(wait, 1)
+                if selector.get_map():
+                    for key, _ in selector.select(timeout=wait):
+                        if key.data is None:
+                            # Process exited - stop watching its pidfd; poll() below reaps it
+                            selector.unregister(key.fileobj)
+                            os.close(key.fileobj)
+                        else:
+                            read_stderr(key.data, key.fileobj)
+                else:
+                    time.sleep(wait)
+                
+                for index, process in enumerate(processes):
+                    if return_codes[index] is None:
+                        return_code = process.poll()
+                        if return_code is not None:
+                            # Process completed - drain what is left of its stderr, then unregister it
+                            if process.stderr is not None and not process.stderr.closed:
+                                read_stderr(index, process.stderr)
+                            _unregister_process(process)
+                            return_codes[index] = return_code
+                if all(code is not None for code in return_codes):
+                    return return_codes, False
                 
                 elapsed = time.time() - process_start_time
                 if elapsed > timeout_seconds:
                     timeout_minutes = timeout_seconds / 60
                     logger.warning(f"{step_message} exceeded timeout of {timeout_minutes:.1f} minutes")
-                    process.kill()
-                    process.wait()
-                    return -1, True
+                    for index, process in enumerate(processes):
+                        if return_codes[index] is None:
+                            # Kill the tool's whole group, not just its bash wrapper
+                            _signal_process(process, signal.SIGKILL, _active_processes.get(process))
+                            process.wait()
+                            return_codes[index] = -1
+                    return return_codes, True
+                
+                # Progress changes are written back in one UPDATE per wake-up
+                dirty_fields = []
+                
+                # Map parsed tool progress onto the job's progress bar (at most every 5s)
+                reported = [percent for percent in percents if percent is not None]
+                if job and progress_range and reported and time.time() - last_percent_save >= 5:
+                    start, end = progress_range
+                    progress = int(start + (end - start) * (sum(reported) / len(reported)) / 100)
+                    if progress != job.progress:
+                        job.progress = progress
+                        dirty_fields.append('progress')
+                    last_percent_save = time.time()
                 
-                # Update progress message periodically
-                if time.time() - last_progress_update > check_interval:
+                # Update progress message periodically (persisted at most every 30s)
+                if time.time() - last_progress_update >= check_interval:
                     elapsed_minutes = int(elapsed / 60)
                     elapsed_seconds = int(elapsed % 60)
-                    if job:
+                    if job and time.time() - last_message_save >= _PROGRESS_MESSAGE_MIN_INTERVAL:
                         if elapsed_minutes > 0:
-                            job.progress_message = f'{step_message}... Elapsed: {elapsed_minutes}m {elapsed_seconds}s'
+                            progress_message = f'{step_message}... Elapsed: {elapsed_minutes}m {elapsed_seconds}s'
                         else:
-                            job.progress_message = f'{step_message}... Elapsed: {elapsed_seconds}s'
-                        try:
-                            job.save(update_fields=['progress_message'])
-                        except Exception as e:
-                            logger.warning(f"Could not update job progress message: {e}")
+                            progress_message = f'{step_message}... Elapsed: {elapsed_seconds}s'
+                        job.progress_message = progress_message
+                        dirty_fields.append('progress_message')
+                        last_message_save = time.time()
                     logger.info(f"{step_message} still running... ({elapsed_minutes}m {elapsed_seconds}s elapsed)")
                     last_progress_update = time.time()
                 
-                time.sleep(1)
+                if dirty_fields:
+                    try:
+                        job.save(update_fields=dirty_fields)
+                    except Exception as e:
+                        logger.warning(f"Could not update job progress: {e}")
                 
         except KeyboardInterrupt:
             logger.warning(f"Received KeyboardInterrupt during {step_message}, terminating process...")
-            process.terminate()
-            try:
-                process.wait(timeout=30)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                process.wait()
-            return -1, False
+            for index, process in enumerate(processes):
+                if return_codes[index] is None:
+                    pgid = _active_processes.get(process)
+                    _signal_process(process, signal.SIGTERM, pgid)
+                    try:
+                        process.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        _signal_process(process, signal.SIGKILL, pgid)
+                        process.wait()
+            return [-1] * len(processes), False
+        finally:
+            for key in list(selector.get_map().values()):
+                if key.data is None:
+                    os.close(key.fileobj)
+                else:
+                    key.fileobj.close()
+            selector.close()
     
     def _read_log_files(self, stdout_file, stderr_file):
         """
         Read stdout and stderr log files.
+        Files larger than _LOG_TAIL_BYTES are tailed (callers only log the end).
         
         Args:
             stdout_file: Path to stdout log file
@@ -616,18 +1623,7 @@ class EggnogProcessor:
         Returns:
             tuple: (stdout_content, stderr_content)
         """
-        stdout_content = ""
-        stderr_content = ""
-        
-        if stdout_file.exists():
-            with open(stdout_file, 'r', encoding='utf-8') as f:
-                stdout_content = f.read()
-        
-        if stderr_file.exists():
-            with open(stderr_file, 'r', encoding='utf-8') as f:
-                stderr_content = f.read()
-        
-        return stdout_content, stderr_content
+        return _read_log_tail(stdout_file), _read_log_tail(stderr_file)
     
     def _load_script_template(self, template_name, replacements):
         """
@@ -640,19 +1636,21 @@ class EggnogProcessor:
         Returns:
             Script content with replacements applied
         """
-        template_path = Path(__file__).parent / "scripts" / f"{template_name}_template.py"
+        template_path = _SCRIPTS_DIR / f"{template_name}_template.py"
         
-        if not template_path.exists():
+        try:
+            template_content = _read_template(str(template_path))
+        except FileNotFoundError:
             raise FileNotFoundError(f"Template not found: {template_path}")
         
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
-        # Replace placeholders
-        for placeholder, value in replacements.items():
-            template_content = template_content.replace(f"{{{placeholder}}}", str(value))
+        if not replacements:
+            return template_content
         
-        return template_content
+        # Replace all placeholders in a single pass. str.format_map is not usable here
+        # because the templates contain their own f-strings and dict literals.
+        values = {f"{{{placeholder}}}": str(value) for placeholder, value in replacements.items()}
+        pattern = re.compile('|'.join(re.escape(placeholder) for placeholder in values))
+        return pattern.sub(lambda m: values[m.group(0)], template_content)
     
     def _run_script_template(self, template_name, replacements, temp_dir, conda_env='eggnog', timeout=300, step_name='Script'):
         """
@@ -669,22 +1667,27 @@ class EggnogProcessor:
         Returns:
             tuple: (success: bool, result: subprocess.CompletedProcess or None)
         """
-        script_file = temp_dir / f"run_{template_name}.py"
+        # Unique name: the same template can run concurrently for different inputs
+        stem = temp_dir / f"run_{template_name}_{uuid.uuid4().hex[:8]}"
+        script_file = stem.with_suffix('.py')
         script_content = self._load_script_template(template_name, replacements)
         
         with open(script_file, 'w', encoding='utf-8') as f:
             f.write(script_content)
         
         script_wsl = self._to_wsl_path(str(script_file))
-        cmd = f"""source ~/miniconda3/etc/profile.d/conda.sh && conda activate {conda_env} && python3 {script_wsl}"""
+        cmd = f"""{_conda_prefix(conda_env)}python3 {script_wsl}"""
         
+        # Output goes to files rather than pipes: memory stays constant however much the
+        # script prints, and only the tails that get logged are read back and decoded
+        out_file, err_file = stem.with_suffix('.out'), stem.with_suffix('.err')
         logger.info(f"Running {step_name}: {cmd}")
-        result = subprocess.run(['bash', '-c', cmd],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            timeout=timeout
+        with open(out_file, 'wb') as stdout, open(err_file, 'wb') as stderr:
+            completed = subprocess.run(['bash', '-c', cmd], stdout=stdout, stderr=stderr, timeout=timeout)
+        result = subprocess.CompletedProcess(
+            cmd, completed.returncode,
+            _read_log_tail(out_file, max_bytes=_SCRIPT_OUTPUT_TAIL_BYTES),
+            _read_log_tail(err_file, max_bytes=_SCRIPT_OUTPUT_TAIL_BYTES)
         )
         
         if result.returncode == 0:
@@ -697,6 +1700,65 @@ class EggnogProcessor:
             logger.error(error_msg)
             return False, result
     
+    def _run_script_template_batch(self, steps, temp_dir, conda_env='eggnog', timeout=600, parallel=False):
+        """
+        Run several independent script templates in one shell invocation, so the shell
+        start and conda env setup are paid once. A failing step does not stop the others.
+        
+        Args:
+            steps: List of (template_name, replacements, step_name) tuples
+            temp_dir: Temporary directory to write scripts and per-step logs
+            conda_env: Conda environment name shared by all steps (default: 'eggnog')
+            timeout: Timeout in seconds for the whole batch (default: 600)
+            parallel: Run the steps as concurrent background jobs (default: False)
+            
+        Returns:
+            list: (success: bool, result: subprocess.CompletedProcess) per step, in order
+        """
+        batch_id = uuid.uuid4().hex[:8]
+        step_files = []
+        commands = []
+        for index, (template_name, replacements, step_name) in enumerate(steps):
+            stem = temp_dir / f"run_{template_name}_{batch_id}_{index}"
+            script_file = stem.with_suffix('.py')
+            with open(script_file, 'w', encoding='utf-8') as f:
+                f.write(self._load_script_template(template_name, replacements))
+            files = (stem.with_suffix('.out'), stem.with_suffix('.err'), stem.with_suffix('.rc'))
+            step_files.append(files)
+            step_cmd = (
+                f"python3 {self._to_wsl_path(str(script_file))} > {self._to_wsl_path(str(files[0]))} "
+                f"2> {self._to_wsl_path(str(files[1]))}; echo $? > {self._to_wsl_path(str(files[2]))}"
+            )
+            commands.append(f"( {step_cmd} ) &" if parallel else step_cmd)
+        if parallel:
+            commands.append("wait")
+        
+        # Steps run only if the env setup succeeded; each records its own exit status
+        cmd = f"{_conda_prefix(conda_env)}{{\n" + "\n".join(commands) + "\n}"
+        logger.info(f"Running {', '.join(step[2] for step in steps)} in one shell: {cmd}")
+        # Each step writes its own output files; the shell's output only matters if env setup fails
+        _, batch_output = _sh(cmd, timeout)
+        
+        results = []
+        for (template_name, replacements, step_name), (out_file, err_file, rc_file) in zip(steps, step_files):
+            try:
+                returncode = int(Path(rc_file).read_text().strip())
+            except (OSError, ValueError):
+                returncode = -1
+            stdout = _read_log_tail(out_file, max_bytes=_SCRIPT_OUTPUT_TAIL_BYTES)
+            # A step that never ran (env setup failed) reports the batch's own stderr
+            stderr = _read_log_tail(err_file, max_bytes=_SCRIPT_OUTPUT_TAIL_BYTES) if os.path.exists(err_file) else batch_output.decode('utf-8', errors='replace')
+            result = subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+            if returncode == 0:
+                logger.info(f"✅ {step_name} completed successfully")
+                if stdout:
+                    logger.info(f"{step_name} stdout: {stdout[-500:]}")
+                results.append((True, result))
+            else:
+                logger.error(f"{step_name} failed (return code {returncode}): {stderr[-1000:] if stderr else 'No error output'}")
+                results.append((False, result))
+        return results
+    
     def _normalize_path_to_wsl(self, path):
         """
         Normalize a path string to Linux format (helper for __init__).
@@ -708,55 +1770,65 @@ class EggnogProcessor:
         Returns:
             Normalized Linux path string
         """
-        if isinstance(path, Path):
-            path_str = str(path)
-        else:
-            path_str = path
-        
-        # Already WSL path
-        if path_str.startswith(('/home/', '/mnt/', '/usr/', '/opt/')):
-            return path_str.replace('\\', '/')
-        
-        # Windows path - simple conversion (full conversion done later if needed)
-        if ':' in path_str or path_str.startswith('\\'):
-            # Simple fallback conversion
-            normalized = path_str.replace('\\', '/')
-            # Convert drive letters (C: -> /mnt/c)
-            if ':' in normalized:
-                parts = normalized.split(':', 1)
-                if len(parts) == 2:
-                    drive = parts[0].lower()
-                    rest = parts[1].lstrip('/')
-                    return f"/mnt/{drive}/{rest}"
-            return normalized
-        
-        # Already forward slashes
-        return path_str.replace('\\', '/')
+        return _normalize_path_str(str(path))
+    
+    def _probe_paths(self, paths, head_bytes=8):
+        """
+        Check several files at once, replacing per-file `bash -c "test -f/test -s/head -1"` calls.
+        The pipeline runs directly on Linux, so this is plain stat()/read() with no subprocess.
+        
+        Args:
+            paths: Iterable of file paths
+            head_bytes: Number of leading bytes to read from each existing file
+            
+        Returns:
+            dict: path -> {'exists': bool, 'size': int, 'head': bytes}
+                  'exists' is True only for regular files (like `test -f`)
+        """
+        results = {}
+        for path in paths:
+            info = {'exists': False, 'size': 0, 'head': b''}
+            try:
+                st = os.stat(path)
+                if stat.S_ISREG(st.st_mode):
+                    info['exists'] = True
+                    info['size'] = st.st_size
+                    if head_bytes and st.st_size:
+                        with open(path, 'rb') as f:
+                            info['head'] = f.read(head_bytes)
+            except OSError:
+                pass
+            results[path] = info
+        return results
     
     def _setup_ramdisk(self):
         """
         Setup RAM disk for fast database access (10GB tmpfs).
         Returns RAM disk path if successful, None otherwise.
         This is optional - pipeline will work without it, just slower.
+        The result is cached on the instance, so the mount probe runs only once.
+        """
+        if self._ramdisk_path is _UNSET:
+            self._ramdisk_path = self._mount_ramdisk()
+        return self._ramdisk_path
+    
+    def _mount_ramdisk(self):
+        """
+        Probe for (and if needed mount) the RAM disk. Use _setup_ramdisk() instead.
         """
         ramdisk_path = "/mnt/ramdisk"
         
-        # First check if already mounted (fast check)
-        check_cmd = f"mountpoint -q {ramdisk_path} 2>/dev/null && echo 'mounted' || echo 'not_mounted'"
-        try:
-            check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=5)
-            if 'mounted' in check_result.stdout:
-                logger.info(f"✅ RAM disk already available at {ramdisk_path}")
-                return ramdisk_path
-        except subprocess.TimeoutExpired:
-            logger.warning(f"⚠️  RAM disk check timed out. Continuing without RAM disk optimization.")
-            return None
-        except Exception as e:
-            logger.warning(f"⚠️  Could not check RAM disk status: {e}. Continuing without RAM disk optimization.")
-            return None
+        # First check if already mounted (fast check: a stat pair, no subprocess)
+        if os.path.ismount(ramdisk_path):
+            logger.info(f"✅ RAM disk already available at {ramdisk_path}")
+            return ramdisk_path
         
         # STEP 2: Setup RAM disk (tmpfs mount) - Force RAM caching
-        # Try to setup RAM disk with sudo if needed
+        # Try to setup RAM disk with sudo if needed.
+        # huge=always backs the database with 2 MB pages (fewer TLB misses while DIAMOND
+        # scans it) unless /sys/kernel/mm/transparent_hugepage/shmem_enabled is 'deny';
+        # kernels without tmpfs hugepage support reject the option, so retry without it.
+        # noatime skips an inode update on every read.
         setup_cmd = f"""
         # Try to create directory first (may not need sudo)
         mkdir -p {ramdisk_path} 2>/dev/null || true
@@ -765,19 +1837,22 @@ class EggnogProcessor:
             echo "already_mounted"
         else
             # Try mounting without sudo first (if user has permissions)
-            if mount -t tmpfs -o size=10G tmpfs {ramdisk_path} 2>/dev/null; then
+            if mount -t tmpfs -o {_RAMDISK_MOUNT_OPTS},huge=always tmpfs {ramdisk_path} 2>/dev/null || \
+               mount -t tmpfs -o {_RAMDISK_MOUNT_OPTS} tmpfs {ramdisk_path} 2>/dev/null; then
                 echo "mounted"
             else
                 # Try with sudo (STEP 2: Force RAM caching)
                 sudo mkdir -p {ramdisk_path} 2>/dev/null || true
-                sudo mount -t tmpfs -o size=10G tmpfs {ramdisk_path} 2>/dev/null && echo "mounted" || echo "mount_failed"
+                {{ sudo mount -t tmpfs -o {_RAMDISK_MOUNT_OPTS},huge=always tmpfs {ramdisk_path} 2>/dev/null || \
+                  sudo mount -t tmpfs -o {_RAMDISK_MOUNT_OPTS} tmpfs {ramdisk_path} 2>/dev/null; }} && echo "mounted" || echo "mount_failed"
             fi
         fi
         """
         
         try:
-            result = subprocess.run(['bash', '-c', setup_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            if 'mounted' in result.stdout or 'already_mounted' in result.stdout:
+            _, output = _sh(setup_cmd, 10)
+            status = output.split()
+            if b'mounted' in status or b'already_mounted' in status:
                 logger.info(f"✅ RAM disk available at {ramdisk_path}")
                 return ramdisk_path
             else:
@@ -797,45 +1872,196 @@ class EggnogProcessor:
         """
         logger.warning(f"⚠️  DIAMOND database is corrupted. Attempting to rebuild...")
         
-        # Backup corrupted database
-        backup_cmd = f"mv {eggnog_db_wsl}/eggnog_proteins.dmnd {eggnog_db_wsl}/eggnog_proteins.dmnd.corrupted 2>/dev/null || true"
-        subprocess.run(['bash', '-c', backup_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=30)
+        eggnog_proteins_dmnd = f"{eggnog_db_wsl}/eggnog_proteins.dmnd"
         
         # Rebuild database (DIAMOND, MMseqs, and HMMER for Bacteria)
         logger.info(f"🔧 Rebuilding EggNOG database (~30-60 minutes)...")
         logger.info(f"   This will download: DIAMOND (default), MMseqs2 (-M), and HMMER Bacteria (-H -d 2)")
-        logger.info(f"   Command: download_eggnog_data.py --data_dir {eggnog_db_wsl} -M -H -d 2 -y -f")
         
-        rebuild_cmd = f"""
-        source ~/miniconda3/etc/profile.d/conda.sh && conda activate eggnog && \
-        /home/ser1dai/miniconda3/envs/eggnog/bin/download_eggnog_data.py \
-        --data_dir {eggnog_db_wsl} -M -H -d 2 -y -f 2>&1
-        """
+        # Keep the corrupted file as a backup; the rebuild is verified with a non-empty file
+        # check (NO dbinfo - it scans the entire 40GB database)
+        with contextlib.suppress(FileNotFoundError):
+            os.replace(eggnog_proteins_dmnd, f"{eggnog_proteins_dmnd}.corrupted")
+        
+        download_py = "/home/ser1dai/miniconda3/envs/eggnog/bin/download_eggnog_data.py"
+        shared = self._probe_paths([f"{eggnog_db_wsl}/eggnog.db", f"{eggnog_db_wsl}/eggnog.taxa.db"], head_bytes=0)
+        if all(info['size'] > 0 for info in shared.values()):
+            # Every run fetches eggnog.db/eggnog.taxa.db unless present; with those in place the
+            # components write disjoint files, so they download side by side. Without -f only
+            # missing components (at least the moved-aside DIAMOND database) are fetched.
+            components = {
+                'DIAMOND': f"--data_dir {eggnog_db_wsl} -y",
+                'MMseqs2': f"--data_dir {eggnog_db_wsl} -D -M -y",
+                'HMMER Bacteria': f"--data_dir {eggnog_db_wsl} -D -H -d 2 -y",
+            }
+        else:
+            components = {'DIAMOND, MMseqs2 and HMMER Bacteria': f"--data_dir {eggnog_db_wsl} -M -H -d 2 -y -f"}
+        
+        def download(name, args):
+            log_name = re.sub(r'\W+', '_', name.lower())
+            rebuild_log = f"{eggnog_db_wsl}/download_eggnog_data_{log_name}.log"
+            logger.info(f"   Command: download_eggnog_data.py {args} (output: {rebuild_log})")
+            # A download that stops printing for 10 minutes has stalled
+            return _run_logged(f"{_conda_prefix('eggnog')}{download_py} {args}", rebuild_log, timeout=7200)
         
-        # Run rebuild in background with progress logging
         logger.info(f"⏳ Starting database rebuild (this may take 30-60 minutes)...")
-        rebuild_result = subprocess.run(['bash', '-c', rebuild_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=7200)
-        
-        if rebuild_result.returncode == 0:
-            # Verify the database was rebuilt correctly
-            # Use fast dbinfo check instead of slow search test
-            # NO dbinfo check - it scans entire 40GB database and is useless at runtime
-            # Just check if file exists after rebuild
-            verify_cmd = f"test -f {eggnog_db_wsl}/eggnog_proteins.dmnd && test -s {eggnog_db_wsl}/eggnog_proteins.dmnd && echo 'exists' || echo 'missing'"
-            verify_result = subprocess.run(['bash', '-c', verify_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            
-            if 'exists' in verify_result.stdout:
-                logger.info(f"✅ EggNOG database rebuilt and verified successfully")
-                return True
-            else:
-                logger.error(f"❌ Database rebuild completed but verification failed. Database may still be corrupted.")
-                return False
-        else:
-            error_output = rebuild_result.stderr[-1000:] if rebuild_result.stderr else rebuild_result.stdout[-1000:]
-            logger.error(f"❌ Failed to rebuild EggNOG database. Error: {error_output}")
-            logger.error(f"   Please run manually: download_eggnog_data.py --data_dir {eggnog_db_wsl} -M -H -d 2 -y -f")
-            return False
+        failed = []
+        with ThreadPoolExecutor(max_workers=len(components), thread_name_prefix='eggnog-download') as pool:
+            futures = {name: pool.submit(download, name, args) for name, args in components.items()}
+            for name, future in futures.items():
+                try:
+                    result = future.result()
+                except subprocess.TimeoutExpired:
+                    logger.error(f"❌ {name} download timed out or stalled")
+                    failed.append(name)
+                    continue
+                if result.returncode != 0:
+                    logger.error(f"❌ {name} download failed (return code {result.returncode}): {result.stdout[-1000:]}")
+                    failed.append(name)
+        
+        # A failed DIAMOND download may leave a partial file behind - only trust a clean exit
+        diamond_ok = not any('DIAMOND' in name for name in failed)
+        if diamond_ok and self._probe_paths([eggnog_proteins_dmnd], head_bytes=0)[eggnog_proteins_dmnd]['size'] > 0:
+            if failed:
+                logger.warning(f"⚠️  DIAMOND database rebuilt, but these components failed: {', '.join(failed)}")
+            logger.info(f"✅ EggNOG database rebuilt and verified successfully")
+            self._quick_db_sanity(eggnog_proteins_dmnd, refresh=True)
+            return True
+        logger.error(f"❌ Failed to rebuild EggNOG database. The corrupted file was kept at {eggnog_proteins_dmnd}.corrupted")
+        logger.error(f"   Please run manually: download_eggnog_data.py --data_dir {eggnog_db_wsl} -M -H -d 2 -y -f")
+        return False
     
+    def _quick_db_sanity(self, db_path, refresh=False):
+        """
+        Cheap integrity check for a large DIAMOND database: file size plus MD5 of the
+        first and last 4 KiB, compared with the .integrity sidecar recorded when the
+        database was first seen or rebuilt. Reads 8 KiB instead of touching the whole file.
+        
+        Args:
+            db_path: Path to the .dmnd file
+            refresh: Record the current signature even if a sidecar exists (after a rebuild)
+            
+        Returns:
+            'ok', 'recorded' (sidecar written now), 'mismatch' or 'missing'
+        """
+        try:
+            with open(db_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return 'missing'
+                head = f.read(4096)
+                f.seek(max(0, size - 4096))
+                tail = f.read(4096)
+        except OSError:
+            return 'missing'
+        
+        signature = {
+            'size': size,
+            'head_md5': hashlib.md5(head).hexdigest(),
+            'tail_md5': hashlib.md5(tail).hexdigest(),
+        }
+        integrity_path = f"{db_path}.integrity"
+        
+        if not refresh:
+            try:
+                with open(integrity_path, 'r', encoding='utf-8') as f:
+                    recorded = json.load(f)
+                return 'ok' if recorded == signature else 'mismatch'
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                return 'mismatch'
+        
+        try:
+            with open(integrity_path, 'w', encoding='utf-8') as f:
+                json.dump(signature, f)
+        except OSError as e:
+            logger.warning(f"Could not write database integrity record {integrity_path}: {e}")
+        return 'recorded'
+    
+    def _build_fingerprint(self, source_paths, ko_list_path):
+        """
+        Describe the inputs of a derived database build: (mtime, size) of each
+        source file and the SHA-256 of the KO list.
+        
+        Args:
+            source_paths: Files the artifact is built from
+            ko_list_path: KO list file used to select entries
+            
+        Returns:
+            dict with 'sources' and 'ko_list_sha256'
+        """
+        sources = {}
+        for path in source_paths:
+            try:
+                st = os.stat(path)
+                sources[str(path)] = [st.st_mtime, st.st_size]
+            except OSError:
+                sources[str(path)] = None
+        try:
+            with open(ko_list_path, 'rb') as f:
+                ko_list_sha256 = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            ko_list_sha256 = None
+        return {'sources': sources, 'ko_list_sha256': ko_list_sha256}
+    
+    def _build_meta_status(self, artifact_path, fingerprint):
+        """
+        Compare an artifact's .meta sidecar with the current build inputs.
+        
+        Returns:
+            'current', 'stale' (inputs changed or unreadable sidecar) or 'missing'
+        """
+        try:
+            with open(f"{artifact_path}.meta", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return 'missing'
+        except (OSError, ValueError):
+            return 'stale'
+        recorded = meta.get('sources') or {}
+        for path, current in fingerprint['sources'].items():
+            # A source that has since been removed cannot be rebuilt from - keep the artifact
+            if current is not None and recorded.get(path) != current:
+                return 'stale'
+        if meta.get('ko_list_sha256') != fingerprint['ko_list_sha256']:
+            return 'stale'
+        return 'current'
+    
+    def _write_build_meta(self, artifact_path, fingerprint):
+        """Record the inputs an artifact was built from in its .meta sidecar"""
+        meta_path = f"{artifact_path}.meta"
+        try:
+            with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(dict(fingerprint, built_at=time.time()), f)
+            os.replace(f"{meta_path}.tmp", meta_path)
+        except OSError as e:
+            logger.warning(f"Could not write build metadata {meta_path}: {e}")
+    
+    def _diamond_seq_count(self, dmnd_path):
+        """
+        Read the sequence count from a DIAMOND database header.
+        
+        A .dmnd file starts with: uint64 magic, uint32 build, uint32 db_version,
+        uint64 sequences, uint64 letters (little-endian).
+        
+        Returns:
+            int: Number of sequences, or None if the file is unreadable or not a DIAMOND database
+        """
+        try:
+            with open(dmnd_path, 'rb') as f:
+                header = f.read(_DIAMOND_HEADER.size)
+        except OSError:
+            return None
+        if len(header) < _DIAMOND_HEADER.size:
+            return None
+        magic, _build, _db_version, sequences = _DIAMOND_HEADER.unpack(header)
+        if magic != _DIAMOND_MAGIC:
+            logger.warning(f"⚠️  {dmnd_path} does not have a DIAMOND database header")
+            return None
+        return sequences
+    
+    @_cached_path_result
     def _ensure_gut_database(self, eggnog_db_wsl):
         """
         Ensure clean gut database exists. Create it if missing.
@@ -847,54 +2073,42 @@ class EggnogProcessor:
         """
         gut_db_path = f"{eggnog_db_wsl}/gut_kegg_db/gut_db_clean.dmnd"
         # Use KO list file from project directory (fasta_processor/your_24_pathways_kos.txt)
-        ko_list_path = Path(__file__).parent / "your_24_pathways_kos.txt"
-        ko_list_file = self._to_wsl_path(str(ko_list_path))
+        ko_list_file = _KO_LIST_FILE
         proteomes_faa = f"{eggnog_db_wsl}/e5.proteomes.faa"
+        gut_clean_fa = f"{eggnog_db_wsl}/gut_clean.fa"
+        fingerprint = self._build_fingerprint([proteomes_faa], ko_list_file)
+        meta_status = self._build_meta_status(gut_db_path, fingerprint)
+        
+        # Check the database and both build inputs with one batch of stat() calls
+        probe = self._probe_paths([gut_db_path, ko_list_file, proteomes_faa], head_bytes=0)
+        gut_db_exists = probe[gut_db_path]['exists']
         
-        # Check if gut database already exists
-        check_cmd = f"test -f {gut_db_path} && echo 'exists' || echo 'missing'"
-        check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
+        if gut_db_exists and not self._force_rebuild and meta_status == 'current':
+            # Built from the same proteomes and KO list - nothing to verify
+            logger.info(f"✅ Clean gut database found at {gut_db_path} (build metadata current)")
+            return gut_db_path
         
-        if 'exists' in check_result.stdout:
-            # Verify database is not empty and has reasonable size
+        if gut_db_exists and not self._force_rebuild and meta_status == 'stale':
+            logger.info(f"🔁 Source files or KO list changed since {gut_db_path} was built. Rebuilding...")
+        elif gut_db_exists and not self._force_rebuild:
+            # Built before build metadata existed - verify it once, then record its inputs
             # Expected: ~100-250 proteins (at least 50 KOs should be represented)
-            check_size_cmd = f"diamond viewdb {gut_db_path} 2>/dev/null | grep -c 'sequences' || echo '0'"
-            try:
-                # Increase timeout to 60 seconds for diamond viewdb (can be slow on large databases)
-                size_result = subprocess.run(['bash', '-c', check_size_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=60)
-                seq_count = int(size_result.stdout.strip())
-                if seq_count >= 50:  # At least 50 sequences (reasonable minimum)
-                    logger.info(f"✅ Clean gut database found at {gut_db_path} ({seq_count} sequences)")
-                    return gut_db_path
-                else:
-                    logger.warning(f"⚠️  Existing gut database has only {seq_count} sequences (expected 100-250). Rebuilding...")
-                    # Delete old database to force rebuild
-                    subprocess.run(['bash', '-c', f"rm -f {gut_db_path} {gut_db_path}.dmnd {gut_clean_fa} 2>/dev/null"], 
-                                 capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            except subprocess.TimeoutExpired:
-                # If diamond viewdb times out, the database might be corrupted or very large
-                # Log warning but assume it's valid to avoid blocking initialization
-                logger.warning(f"⚠️  Timeout checking gut database size at {gut_db_path}. Database may be large or slow to read. Assuming valid.")
-                logger.info(f"✅ Clean gut database found at {gut_db_path} (size check timed out)")
-                return gut_db_path
-            except (ValueError, AttributeError):
-                # If we can't check size, assume it's valid
-                logger.info(f"✅ Clean gut database found at {gut_db_path}")
+            seq_count = self._diamond_seq_count(gut_db_path) or 0
+            if seq_count >= 50:  # At least 50 sequences (reasonable minimum)
+                logger.info(f"✅ Clean gut database found at {gut_db_path} ({seq_count} sequences)")
+                self._write_build_meta(gut_db_path, fingerprint)
                 return gut_db_path
+            logger.warning(f"⚠️  Existing gut database has only {seq_count} sequences (expected 100-250). Rebuilding...")
+            # Delete old database to force rebuild
+            _remove_files([gut_db_path, f"{gut_db_path}.dmnd", gut_clean_fa])
         
         # Check if we have the required files to build it
-        check_ko_cmd = f"test -f {ko_list_file} && echo 'exists' || echo 'missing'"
-        ko_check = subprocess.run(['bash', '-c', check_ko_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'missing' in ko_check.stdout:
+        if not probe[ko_list_file]['exists']:
             logger.warning(f"⚠️  KO list file not found at {ko_list_file}. Skipping gut database creation.")
             return None
         
         # Check if e5.proteomes.faa exists (authoritative protein FASTA - 9GB clean source)
-        check_faa_cmd = f"test -f {proteomes_faa} && echo 'exists' || echo 'missing'"
-        faa_check = subprocess.run(['bash', '-c', check_faa_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'missing' in faa_check.stdout:
+        if not probe[proteomes_faa]['exists']:
             logger.warning(f"⚠️  e5.proteomes.faa not found at {proteomes_faa}. Cannot build clean gut database.")
             logger.warning(f"   Falling back to old method using eggnog_proteins.fa...")
             # Fallback to old method
@@ -906,109 +2120,47 @@ class EggnogProcessor:
         logger.info(f"   This creates a tiny database (~100-250 proteins) that is extremely fast (0.05-0.2 sec queries)")
         logger.info(f"   Using e5.proteomes.faa as authoritative source (9GB clean biological data)")
         
-        gut_clean_fa = f"{eggnog_db_wsl}/gut_clean.fa"
         gut_db_dir = f"{eggnog_db_wsl}/gut_kegg_db"
         
-        # Log the KO list file being used
-        try:
-            ko_count = len([line for line in open(str(Path(__file__).parent / 'your_24_pathways_kos.txt')) if line.strip()])
-            logger.info(f"📋 Using KO list file: {ko_list_file}")
-            logger.info(f"   Expected KOs: {ko_count} KOs from your_24_pathways_kos.txt")
-        except Exception as e:
-            logger.warning(f"Could not read KO list file for logging: {e}")
-        
-        # Python script to select best representative per KO (longest sequence)
-        build_clean_fasta_script = f"""
-import re
-import sys
-
-kos = set(x.strip() for x in open("{ko_list_file}"))
-best = {{}}
-hdr = None
-seq = ""
-
-def commit():
-    global hdr, seq
-    if hdr:
-        # Try multiple KO patterns: K\\d{{5}} or KO:\\d+ or KO\\d{{5}}
-        # First try standard K\\d{{5}} format
-        m = re.search(r"(K\\d{{5}})", hdr)
-        if not m:
-            # Try KO: format (e.g., KO:00813)
-            m = re.search(r"KO:(\\d+)", hdr)
-        if not m:
-            # Try KO\\d{{5}} format (e.g., KO00813)
-            m = re.search(r"KO(\\d{{5}})", hdr)
-        if m:
-            ko = m.group(1)
-            # Normalize KO format to K\\d{{5}}
-            if ko.startswith("KO:"):
-                ko = "K" + ko[3:].zfill(5)
-            elif ko.startswith("KO"):
-                ko = "K" + ko[2:].zfill(5)
-            elif not ko.startswith("K"):
-                ko = "K" + ko.zfill(5)
-            if ko in kos:
-                if ko not in best or len(seq) > len(best[ko][1]):
-                    best[ko] = (hdr, seq)
-
-try:
-    with open("{proteomes_faa}", "r") as f:
-        for line in f:
-            if line.startswith(">"):
-                commit()
-                hdr = line.strip()
-                seq = ""
-            else:
-                seq += line.strip()
-    commit()
-    
-    with open("{gut_clean_fa}", "w") as o:
-        for h, s in best.values():
-            o.write(h + "\\n" + s + "\\n")
-    
-    print(f"✅ Created clean gut FASTA with {{len(best)}} KO representatives")
-    sys.exit(0)
-except Exception as e:
-    print(f"❌ Error building clean gut FASTA: {{e}}")
-    sys.exit(1)
-"""
-        
         # Create directory first
-        mkdir_cmd = f"mkdir -p {gut_db_dir}"
-        subprocess.run(['bash', '-c', mkdir_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
+        os.makedirs(gut_db_dir, exist_ok=True)
         
-        # Run Python script to build clean FASTA
-        build_fasta_cmd = f"python3 <<'PYTHON_EOF'\n{build_clean_fasta_script}\nPYTHON_EOF"
-        build_result = subprocess.run(['bash', '-c', build_fasta_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=1800)
-        
-        if build_result.returncode != 0:
-            logger.warning(f"⚠️  Failed to build clean gut FASTA: {build_result.stderr[-500:] if build_result.stderr else build_result.stdout[-500:]}")
+        # Read the KO list once (logged here and passed to the scanner), then select the best
+        # representative per KO (longest sequence), in-process
+        try:
+            with open(ko_list_file, 'rb') as f:
+                kos = frozenset(f.read().split())
+            logger.info(f"📋 Using KO list file: {ko_list_file}")
+            logger.info(f"   Expected KOs: {len(kos)} KOs from your_24_pathways_kos.txt")
+            selected = self._select_ko_representatives(
+                proteomes_faa, kos, gut_clean_fa,
+                n_workers=getattr(settings, 'FASTA_PROCESSING_CPU_CORES', 4)
+            )
+            logger.info(f"✅ Created clean gut FASTA with {selected} KO representatives")
+        except OSError as e:
+            logger.warning(f"⚠️  Failed to build clean gut FASTA: {e}")
             logger.warning(f"   Falling back to old method...")
             return self._ensure_gut_database_fallback(eggnog_db_wsl)
         
         # Check if clean FASTA was created
-        check_clean_fa_cmd = f"test -f {gut_clean_fa} && test -s {gut_clean_fa} && echo 'exists' || echo 'missing'"
-        clean_fa_check = subprocess.run(['bash', '-c', check_clean_fa_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'missing' in clean_fa_check.stdout:
+        if not (os.path.isfile(gut_clean_fa) and os.path.getsize(gut_clean_fa) > 0):
             logger.warning(f"⚠️  Clean gut FASTA not created. Falling back to old method...")
             return self._ensure_gut_database_fallback(eggnog_db_wsl)
         
         # STEP 2: Build clean DIAMOND DB (will finish in seconds)
         logger.info(f"🔧 STEP 2: Building clean DIAMOND database (this will finish in seconds)...")
+        cpu_cores = getattr(settings, 'FASTA_PROCESSING_CPU_CORES', 4)
         create_db_cmd = f"""
-        source ~/miniconda3/etc/profile.d/conda.sh && conda activate eggnog && \
-        diamond makedb -p 4 --in {gut_clean_fa} -d {gut_db_dir}/gut_db_clean
+        {_conda_prefix('eggnog')}\
+        diamond makedb -p {cpu_cores} --in {gut_clean_fa} -d {gut_db_dir}/gut_db_clean
         """
         
-        create_result = subprocess.run(['bash', '-c', create_db_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=600)
+        create_result = _run_logged(create_db_cmd, f"{gut_db_dir}/gut_db_clean.makedb.log", timeout=600)
         
         # Check if gut database file exists (Linux path)
-        check_exists_cmd = f"test -f {gut_db_path} && echo 'exists' || echo 'missing'"
-        exists_check = subprocess.run(['bash', '-c', check_exists_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        if create_result.returncode == 0 and 'exists' in exists_check.stdout:
+        if create_result.returncode == 0 and os.path.isfile(gut_db_path):
             logger.info(f"✅ Clean gut database created successfully at {gut_db_path}")
+            self._write_build_meta(gut_db_path, fingerprint)
             logger.info(f"   Database size: ~100-250 proteins (extremely fast: 0.05-0.2 sec queries)")
             return gut_db_path
         else:
@@ -1017,57 +2169,129 @@ except Exception as e:
             logger.warning(f"   Falling back to old method...")
             return self._ensure_gut_database_fallback(eggnog_db_wsl)
     
+    def _select_ko_representatives(self, proteomes_faa, kos, gut_clean_fa, n_workers=1):
+        """
+        Write the longest sequence per listed KO from a proteome FASTA to gut_clean_fa.
+        
+        Streams the file as bytes (no decoding of the ~9 GB source). Large files are cut
+        at record boundaries into n_workers shards scanned in separate processes; the
+        shard results are merged in file order, so the output matches a single scan.
+        
+        Args:
+            proteomes_faa: Path to the source protein FASTA (e5.proteomes.faa)
+            kos: Set of KO ids (bytes) to select representatives for
+            gut_clean_fa: Path to write the representative FASTA
+            n_workers: Number of worker processes for large files (default: 1)
+            
+        Returns:
+            int: Number of KO representatives written
+            
+        Raises:
+            OSError: if a file cannot be read or written
+        """
+        size = os.path.getsize(proteomes_faa)
+        shards = record_ranges(proteomes_faa, n_workers if size >= _PARALLEL_SCAN_MIN_BYTES else 1)
+        
+        if not size:
+            shard_results = []
+        elif len(shards) == 1:
+            shard_results = [scan_ko_shard(proteomes_faa, 0, size, kos)]
+        else:
+            logger.info(f"   Scanning {proteomes_faa} in {len(shards)} parallel shards")
+            # spawn: the caller may be a background thread, where fork is unsafe
+            with ProcessPoolExecutor(max_workers=len(shards), mp_context=multiprocessing.get_context('spawn')) as pool:
+                shard_results = list(pool.map(
+                    scan_ko_shard,
+                    [proteomes_faa] * len(shards),
+                    [start for start, _ in shards],
+                    [end for _, end in shards],
+                    [kos] * len(shards)
+                ))
+        
+        best = {}
+        for shard_best in shard_results:
+            for ko, (hdr, seq) in shard_best.items():
+                if ko not in best or len(seq) > len(best[ko][1]):
+                    best[ko] = (hdr, seq)
+        
+        with open(gut_clean_fa, 'wb', buffering=1 << 20) as o:
+            for hdr, seq in best.values():
+                o.write(hdr + b'\n' + seq + b'\n')
+        return len(best)
+    
     def _ensure_gut_database_fallback(self, eggnog_db_wsl):
         """
-        Fallback method: Build gut database using old method (grep on eggnog_proteins.fa).
+        Fallback method: Build gut database from eggnog_proteins.fa records whose headers
+        mention a listed KO.
         Used when e5.proteomes.faa is not available.
         """
         gut_db_path = f"{eggnog_db_wsl}/gut_kegg_db/gut_db.dmnd"
         # Use KO list file from project directory (fasta_processor/your_24_pathways_kos.txt)
-        ko_list_path = Path(__file__).parent / "your_24_pathways_kos.txt"
-        ko_list_file = self._to_wsl_path(str(ko_list_path))
+        ko_list_file = _KO_LIST_FILE
         eggnog_proteins_fa = f"{eggnog_db_wsl}/eggnog_proteins.fa"
+        fingerprint = self._build_fingerprint([eggnog_proteins_fa], ko_list_file)
+        meta_status = self._build_meta_status(gut_db_path, fingerprint)
         
-        # Check if gut database already exists
-        check_cmd = f"test -f {gut_db_path} && echo 'exists' || echo 'missing'"
-        check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
+        probe = self._probe_paths([gut_db_path, eggnog_proteins_fa], head_bytes=0)
         
-        if 'exists' in check_result.stdout:
+        # Check if gut database already exists (and was built from the current inputs)
+        if probe[gut_db_path]['exists'] and not self._force_rebuild and meta_status != 'stale':
             logger.info(f"✅ Gut database (fallback) found at {gut_db_path}")
+            if meta_status == 'missing':
+                self._write_build_meta(gut_db_path, fingerprint)
             return gut_db_path
         
         # Check if eggnog_proteins.fa exists
-        check_fa_cmd = f"test -f {eggnog_proteins_fa} && echo 'exists' || echo 'missing'"
-        fa_check = subprocess.run(['bash', '-c', check_fa_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'missing' in fa_check.stdout:
+        if not probe[eggnog_proteins_fa]['exists']:
             logger.warning(f"⚠️  eggnog_proteins.fa not found. Cannot build gut database.")
             return None
         
         # Create gut database using old method
-        logger.info(f"🔧 Creating gut database using fallback method (grep on eggnog_proteins.fa)...")
+        logger.info(f"🔧 Creating gut database using fallback method (KO record extraction from eggnog_proteins.fa)...")
         gut_proteins_fa = f"{eggnog_db_wsl}/gut_proteins.fa"
         gut_db_dir = f"{eggnog_db_wsl}/gut_kegg_db"
         
+        cpu_cores = getattr(settings, 'FASTA_PROCESSING_CPU_CORES', 4)
+        
+        # Extract whole FASTA records (header + sequence lines) whose header mentions a listed KO.
+        # A plain `grep -Ff` only returned the matching header lines, leaving a FASTA with no
+        # sequences for diamond makedb. The KO IDs are header substrings rather than sequence
+        # names, so an index lookup (samtools faidx) cannot be used; the records are found
+        # in-process by jumping between headers of the mapped file, and copied in the kernel.
+        os.makedirs(gut_db_dir, exist_ok=True)
+        try:
+            with open(ko_list_file, 'rb') as f:
+                kos = set(f.read().split())
+            spans = ko_record_spans(eggnog_proteins_fa, kos)
+            with open(eggnog_proteins_fa, 'rb') as infile, open(gut_proteins_fa, 'wb') as outfile:
+                for start, end in spans:
+                    self._sendfile_range(outfile.fileno(), infile.fileno(), start, end)
+                # Read once - do not let it push the DIAMOND databases out of the page cache
+                fadvise(infile.fileno(), 'POSIX_FADV_DONTNEED')
+        except OSError as e:
+            logger.warning(f"⚠️  Failed to create gut database (fallback): {e}")
+            return None
+        if not spans:
+            logger.warning(f"⚠️  Failed to create gut database (fallback): no eggnog_proteins.fa records mention a listed KO")
+            return None
+        
         create_cmd = f"""
-        mkdir -p {gut_db_dir} && \
-        grep -Ff {ko_list_file} {eggnog_proteins_fa} > {gut_proteins_fa} && \
-        source ~/miniconda3/etc/profile.d/conda.sh && conda activate eggnog && \
-        diamond makedb -p 4 --in {gut_proteins_fa} -d {gut_db_dir}/gut_db
+        {_conda_prefix('eggnog')}\
+        diamond makedb -p {cpu_cores} --in {gut_proteins_fa} -d {gut_db_dir}/gut_db
         """
         
-        create_result = subprocess.run(['bash', '-c', create_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=3600)
+        create_result = _run_logged(create_cmd, f"{gut_db_dir}/gut_db.makedb.log", timeout=3600)
         
         # Check if gut database file exists
-        check_exists_cmd = f"test -f {gut_db_path} && echo 'exists' || echo 'missing'"
-        exists_check = subprocess.run(['bash', '-c', check_exists_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        if create_result.returncode == 0 and 'exists' in exists_check.stdout:
+        if create_result.returncode == 0 and os.path.isfile(gut_db_path):
             logger.info(f"✅ Gut database (fallback) created successfully at {gut_db_path}")
+            self._write_build_meta(gut_db_path, fingerprint)
             return gut_db_path
         else:
-            logger.warning(f"⚠️  Failed to create gut database (fallback): {create_result.stderr[-500:] if create_result.stderr else 'Unknown error'}")
+            logger.warning(f"⚠️  Failed to create gut database (fallback): {create_result.stdout[-500:] if create_result.stdout else 'Unknown error'}")
             return None
     
+    @_cached_path_result
     def _copy_to_ramdisk(self, source_file, ramdisk_path):
         """
         Copy database file to RAM disk for faster access (STEP 2: Force RAM caching).
@@ -1084,121 +2308,236 @@ except Exception as e:
         base_dir = os.path.dirname(source_file)
         ramdisk_file = f"{ramdisk_path}/{base_name}"
         
-        # Check if already in RAM disk
-        check_cmd = f"test -f {ramdisk_file} && echo 'exists' || echo 'missing'"
-        check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'exists' in check_result.stdout:
-            # Verify file is not empty
-            size_cmd = f"test -s {ramdisk_file} && echo 'has_data' || echo 'empty'"
-            size_result = subprocess.run(['bash', '-c', size_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            if 'has_data' in size_result.stdout:
-                logger.info(f"✅ STEP 2: Database already in RAM disk: {ramdisk_file}")
-                return ramdisk_file
+        # Check if already in RAM disk (not empty, and not older than a rebuilt source)
+        probe = self._probe_paths([ramdisk_file, source_file], head_bytes=0)
+        if probe[ramdisk_file]['size'] > 0 and probe[ramdisk_file]['size'] == probe[source_file]['size']:
+            try:
+                if os.path.getmtime(ramdisk_file) >= os.path.getmtime(source_file):
+                    logger.info(f"✅ STEP 2: Database already in RAM disk: {ramdisk_file}")
+                    return ramdisk_file
+            except OSError:
+                pass
         
         # Copy main database file and all related files to RAM disk
         logger.info(f"📦 STEP 2: Copying database to RAM disk (this may take a minute)...")
         logger.info(f"   This turns HDD into pseudo-SSD for 10x speedup")
         
-        # Copy main file and all related .dmnd files
-        copy_cmd = f"""
-        cp {source_file} {ramdisk_file} 2>&1 && \
-        # Copy any additional DIAMOND database files if they exist
-        (cp {base_dir}/{base_name}.* {ramdisk_path}/ 2>/dev/null || true)
+        # Copy main file and any additional DIAMOND database files (<name>.*)
+        try:
+            self._copy_file_in_kernel(source_file, ramdisk_file, drop_source_cache=True)
+        except OSError as e:
+            logger.warning(f"⚠️  Could not copy to RAM disk: {e}. Using original location.")
+            return source_file
+        
+        prefix = f"{base_name}."
+        try:
+            with os.scandir(base_dir) as entries:
+                related = [entry.path for entry in entries if entry.name.startswith(prefix) and entry.is_file()]
+        except OSError:
+            related = []
+        for related_file in related:
+            try:
+                self._copy_file_in_kernel(related_file, os.path.join(ramdisk_path, os.path.basename(related_file)), drop_source_cache=True)
+            except OSError as e:
+                logger.debug(f"Could not copy {related_file} to RAM disk: {e}")
+        
+        logger.info(f"✅ STEP 2: Database copied to RAM disk: {ramdisk_file}")
+        return ramdisk_file
+    
+    def _copy_file_in_kernel(self, src, dst, chunk=1 << 30, drop_source_cache=False):
         """
-        copy_result = subprocess.run(['bash', '-c', copy_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=600)
+        Copy a file without bouncing its bytes through user space.
         
-        if copy_result.returncode == 0:
-            logger.info(f"✅ STEP 2: Database copied to RAM disk: {ramdisk_file}")
-            return ramdisk_file
-        else:
-            logger.warning(f"⚠️  Could not copy to RAM disk: {copy_result.stderr}. Using original location.")
-            return source_file
+        Uses copy_file_range (reflink/server-side copy where the filesystem supports
+        it), then sendfile, then a plain buffered copy. Mode bits are copied like cp.
+        
+        Args:
+            src: Source file path
+            dst: Destination file path (truncated if it exists)
+            chunk: Maximum bytes per system call
+            drop_source_cache: Evict the source from the page cache afterwards (only the copy will be read)
+        """
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+            fadvise(in_fd, 'POSIX_FADV_SEQUENTIAL')
+            size = os.fstat(in_fd).st_size
+            offset = 0
+            copy_fn = getattr(os, 'copy_file_range', None)
+            while offset < size:
+                try:
+                    if copy_fn is not None:
+                        copied = copy_fn(in_fd, out_fd, min(chunk, size - offset), offset, offset)
+                    else:
+                        os.lseek(out_fd, offset, os.SEEK_SET)
+                        copied = os.sendfile(out_fd, in_fd, offset, min(chunk, size - offset))
+                except OSError as e:
+                    # EXDEV/ENOSYS/EINVAL: fall back to sendfile, then to a buffered copy
+                    if copy_fn is not None:
+                        copy_fn = None
+                        continue
+                    logger.debug(f"In-kernel copy unavailable ({e}); using buffered copy for {src}")
+                    fsrc.seek(offset)
+                    fdst.seek(offset)
+                    shutil.copyfileobj(fsrc, fdst, 1 << 20)
+                    break
+                if copied == 0:
+                    break
+                offset += copied
+            if drop_source_cache:
+                fadvise(in_fd, 'POSIX_FADV_DONTNEED')
+        shutil.copymode(src, dst)
     
+    @_cached_path_result
     def _create_gut_hmm_subset(self, kofam_db_wsl, eggnog_db_wsl):
         """
         Create a smaller HMM database subset containing only gut-related KOs.
         This dramatically speeds up KofamScan (from 20+ minutes to 2-3 minutes).
         """
         # Use KO list file from project directory (fasta_processor/your_24_pathways_kos.txt)
-        ko_list_path = Path(__file__).parent / "your_24_pathways_kos.txt"
-        ko_list_file = self._to_wsl_path(str(ko_list_path))
+        ko_list_file = _KO_LIST_FILE
         full_profiles_hmm = f"{kofam_db_wsl}/profiles.hmm"
         gut_profiles_hmm = f"{kofam_db_wsl}/profiles_gut.hmm"
         
-        # Check if gut subset already exists
-        check_cmd = f"test -f {gut_profiles_hmm} && test -s {gut_profiles_hmm} && echo 'exists' || echo 'missing'"
-        check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
+        # Check gut subset and KO list in one probe
+        probe = self._probe_paths([gut_profiles_hmm, ko_list_file], head_bytes=0)
+        fingerprint = self._build_fingerprint([full_profiles_hmm], ko_list_file)
+        meta_status = self._build_meta_status(gut_profiles_hmm, fingerprint)
         
-        if 'exists' in check_result.stdout:
+        # Check if gut subset already exists (and was built from the current profiles and KO list)
+        if probe[gut_profiles_hmm]['size'] > 0 and not self._force_rebuild and meta_status != 'stale':
             logger.info(f"✅ Gut HMM subset already exists at {gut_profiles_hmm}")
+            if meta_status == 'missing':
+                self._write_build_meta(gut_profiles_hmm, fingerprint)
             return gut_profiles_hmm
         
         # Check if KO list file exists
-        check_ko_cmd = f"test -f {ko_list_file} && echo 'exists' || echo 'missing'"
-        ko_check = subprocess.run(['bash', '-c', check_ko_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'missing' in ko_check.stdout:
+        if not probe[ko_list_file]['exists']:
             logger.warning(f"⚠️  KO list file not found. Using full HMM database (will be slower).")
             return full_profiles_hmm
         
-        # Use hmmfetch (CORRECT method) to extract HMM profiles
-        # This preserves the binary HMM structure correctly - DO NOT use grep/Python extraction
-        logger.info(f"🔧 Creating gut HMM subset using hmmfetch (correct method, preserves binary structure)...")
+        # Drop the old subset's pressed index so hmmpress re-indexes the rebuilt file
+        _remove_files(f"{gut_profiles_hmm}{suffix}" for suffix in _HMM_INDEX_SUFFIXES)
+        _path_cache.pop(('_ensure_hmmpress', gut_profiles_hmm), None)
+        
+        # Copy the matching profile records straight out of profiles.hmm in one pass.
+        # Records are copied byte-for-byte (HMMER3 header through the '//' terminator),
+        # so the HMM structure is preserved exactly.
+        logger.info(f"🔧 Creating gut HMM subset (single-pass record extraction)...")
+        try:
+            with open(ko_list_file, 'r', encoding='utf-8') as f:
+                ko_ids = frozenset(line.strip() for line in f if line.strip())
+            extracted = self._extract_hmm_profiles(full_profiles_hmm, ko_ids, gut_profiles_hmm)
+            logger.info(f"   Extracted {extracted} of {len(ko_ids)} KO profiles")
+        except OSError as e:
+            logger.warning(f"⚠️  Could not extract gut HMM profiles directly: {e}")
+            extracted = 0
+        
+        if extracted > 0 and self._probe_paths([gut_profiles_hmm])[gut_profiles_hmm]['head'].startswith(b'HMMER3'):
+            logger.info(f"✅ Gut HMM subset created successfully")
+            self._write_build_meta(gut_profiles_hmm, fingerprint)
+            # Index the subset
+            self._ensure_hmmpress(gut_profiles_hmm)
+            return gut_profiles_hmm
+        
+        # Fall back to hmmfetch (reads KO names from file)
+        logger.info(f"🔧 Creating gut HMM subset using hmmfetch...")
         
         # First, ensure the full HMM database is indexed
         self._ensure_hmmpress(full_profiles_hmm)
         
-        # Extract profiles using hmmfetch -f (reads KO names from file)
-        # This is the ONLY correct way to extract HMM profiles without corrupting binary structure
         extract_cmd = f"""
-        source ~/miniconda3/etc/profile.d/conda.sh && conda activate kofamscan && \
-        hmmfetch -f {full_profiles_hmm} {ko_list_file} > {gut_profiles_hmm} 2>&1
+        {_conda_prefix('kofamscan')}\
+        hmmfetch -f {full_profiles_hmm} {ko_list_file} > {gut_profiles_hmm}
         """
         
-        extract_result = subprocess.run(['bash', '-c', extract_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=600)
+        # stderr stays out of the HMM file; it is only decoded if the subset is unusable
+        _, extract_output = _sh(extract_cmd, 600)
         
         # Verify the extracted file is valid (must have HMMER3 header)
-        verify_cmd = f"test -f {gut_profiles_hmm} && test -s {gut_profiles_hmm} && head -1 {gut_profiles_hmm} 2>/dev/null | grep -q 'HMMER3' && echo 'valid' || echo 'invalid'"
-        verify_result = subprocess.run(['bash', '-c', verify_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'valid' in verify_result.stdout:
+        if self._probe_paths([gut_profiles_hmm])[gut_profiles_hmm]['head'].startswith(b'HMMER3'):
             logger.info(f"✅ Gut HMM subset created successfully using hmmfetch")
+            self._write_build_meta(gut_profiles_hmm, fingerprint)
             # Index the subset
             self._ensure_hmmpress(gut_profiles_hmm)
             return gut_profiles_hmm
         else:
-            error_msg = extract_result.stderr[-500:] if extract_result.stderr else extract_result.stdout[-500:] if extract_result.stdout else 'Unknown error'
+            error_msg = extract_output[-500:].decode('utf-8', errors='replace') or 'Unknown error'
             logger.warning(f"⚠️  Failed to create gut HMM subset with hmmfetch: {error_msg}. Using full database.")
-            # Clean up invalid file
-            subprocess.run(['bash', '-c', f"rm -f {gut_profiles_hmm} {gut_profiles_hmm}.*"], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
+            # Clean up invalid file (and any index pressed from it)
+            _remove_files([gut_profiles_hmm] + [f"{gut_profiles_hmm}{suffix}" for suffix in _HMM_INDEX_SUFFIXES])
             return full_profiles_hmm
     
+    def _extract_hmm_profiles(self, profiles_hmm, profile_names, output_hmm):
+        """
+        Copy the HMM records whose NAME is in profile_names from an HMMER3 ASCII file.
+        Each record (from its 'HMMER3' line to the '//' terminator) is copied unchanged.
+        
+        Args:
+            profiles_hmm: Path to the full HMM database (text, not pressed)
+            profile_names: Set of profile names (KO IDs) to keep
+            output_hmm: Path to write the subset
+            
+        Returns:
+            int: Number of profiles written
+        """
+        written = 0
+        record = []
+        state = None  # 'header' until NAME is seen, then 'keep' or 'skip' until '//'
+        with open(profiles_hmm, 'rb', buffering=1 << 20) as infile, \
+             open(output_hmm, 'wb', buffering=1 << 20) as outfile:
+            for line in infile:
+                if line.startswith(b'HMMER3'):
+                    record = [line]
+                    state = 'header'
+                elif state == 'skip':
+                    # Unwanted profile: nothing is buffered for the rest of the record
+                    if line.startswith(b'//'):
+                        state = None
+                elif state is not None:
+                    record.append(line)
+                    if state == 'header' and line.startswith(b'NAME '):
+                        name = line[5:].strip().decode('ascii', errors='replace')
+                        if name in profile_names:
+                            state = 'keep'
+                        else:
+                            state = 'skip'
+                            record = []
+                    elif line.startswith(b'//'):
+                        if state == 'keep':
+                            outfile.writelines(record)
+                            written += 1
+                        record = []
+                        state = None
+        return written
+    
+    @_cached_path_result
     def _ensure_hmmpress(self, profiles_hmm):
         """
         Ensure HMM database is pressed (indexed) for faster searches.
         """
         h3i_file = f"{profiles_hmm}.h3i"
-        check_cmd = f"test -f {h3i_file} && test -s {h3i_file} && echo 'exists' || echo 'missing'"
-        check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-        
-        if 'exists' in check_result.stdout:
+        if self._probe_paths([h3i_file], head_bytes=0)[h3i_file]['size'] > 0:
             logger.info(f"✅ HMM database already indexed")
             return True
         
         # Run hmmpress
         logger.info(f"🔧 Indexing HMM database (this may take 5-10 minutes)...")
-        press_cmd = f"source ~/miniconda3/etc/profile.d/conda.sh && conda activate kofamscan && cd $(dirname {profiles_hmm}) && rm -f {profiles_hmm}.h3i && hmmpress -f {profiles_hmm} 2>&1"
-        press_result = subprocess.run(['bash', '-c', press_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=1800)
+        _remove_files([h3i_file])
+        press_cmd = f"{_conda_prefix('kofamscan')}cd $(dirname {profiles_hmm}) && hmmpress -f {profiles_hmm}"
+        try:
+            press_result = _run_logged(press_cmd, f"{profiles_hmm}.hmmpress.log", timeout=1800)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"⚠️  Failed to index HMM database: hmmpress timed out or stalled")
+            return False
         
         if press_result.returncode == 0:
             logger.info(f"✅ HMM database indexed successfully")
             return True
         else:
-            logger.warning(f"⚠️  Failed to index HMM database: {press_result.stderr[-500:] if press_result.stderr else 'Unknown error'}")
+            logger.warning(f"⚠️  Failed to index HMM database: {press_result.stdout[-500:] if press_result.stdout else 'Unknown error'}")
             return False
     
-    def _run_eggnog(self, input_file, output_file, job=None):
+    def _run_eggnog(self, input_file, output_file, job=None, file_size_mb=None):
         """
         Run optimized annotation pipeline:
         1. KofamScan (HMM) - hmmsearch with prebuilt profiles.hmm (FAST - runs first)
@@ -1212,6 +2551,7 @@ except Exception as e:
             input_file: Path to input FASTA file (Linux path)
             output_file: Path to output file (Linux path)
             job: ProcessingJob instance to update progress (optional)
+            file_size_mb: Input size in MB if the caller already has it (optional, saves a stat)
             
         Returns:
             dict with 'success', 'error', 'processing_time', 'version'
@@ -1221,23 +2561,24 @@ except Exception as e:
         # Initialize result file variables
         emapper_enzymes_file = None
         kofamscan_kos_file = None
+        temp_dir = None
+        temp_dir_on_ramdisk = False
         
         try:
             # Normalize paths to Linux format
             input_file_wsl = self._to_wsl_path(input_file)
             output_file_wsl = self._to_wsl_path(output_file)
             
-            # Create temporary directory for intermediate files
-            temp_dir = Path(output_file).parent / f"temp_{int(time.time())}"
-            temp_dir.mkdir(exist_ok=True)
-            temp_dir_wsl = self._to_wsl_path(str(temp_dir))
-            
             # Resource configuration: Get from settings (default: 4 cores, 12 GB RAM)
             cpu_cores = getattr(settings, 'FASTA_PROCESSING_CPU_CORES', 4)
             ram_limit_gb = getattr(settings, 'FASTA_PROCESSING_RAM_GB', 12)
             
-            # Cache file size (used multiple times)
-            file_size_mb = os.path.getsize(input_file) / (1024 * 1024) if os.path.exists(input_file) else 10
+            # Cache file size (used multiple times); process_fasta passes the size it already has
+            if file_size_mb is None:
+                try:
+                    file_size_mb = os.path.getsize(input_file) / (1024 * 1024)
+                except OSError:
+                    file_size_mb = 10
             
             # Ensure eggnog_db_wsl uses forward slashes and is a proper Linux path
             eggnog_db_str = str(self.eggnog_db_path).replace('\\', '/')
@@ -1281,28 +2622,54 @@ except Exception as e:
             ramdisk_path = initialized_paths['ramdisk_path']
             profiles_hmm = initialized_paths['profiles_hmm']
             
+            # Create temporary directory for intermediate files. Prefer the RAM disk when it has
+            # room for the intermediates (removed in finally); otherwise keep them next to the output.
+            temp_dir_name = f"temp_{int(time.time())}"
+            if ramdisk_path:
+                try:
+                    ramdisk_free_mb = shutil.disk_usage(ramdisk_path).free / (1024 * 1024)
+                    if ramdisk_free_mb > file_size_mb * 8 + 512:
+                        temp_dir = Path(ramdisk_path) / temp_dir_name
+                        temp_dir.mkdir(exist_ok=True)
+                        temp_dir_on_ramdisk = True
+                        logger.info(f"Using RAM disk for intermediate files: {temp_dir}")
+                except OSError as e:
+                    logger.warning(f"Could not use RAM disk for intermediate files: {e}")
+            if not temp_dir_on_ramdisk:
+                temp_dir = Path(output_file).parent / temp_dir_name
+                temp_dir.mkdir(exist_ok=True)
+            temp_dir_wsl = self._to_wsl_path(str(temp_dir))
+            
             logger.info(f"✅ Using pre-initialized gut DB: {gut_db_ramdisk if gut_db_ramdisk else gut_db_path}")
             
             # Full database path (only checked if needed, not validated)
             eggnog_proteins_dmnd = f"{eggnog_db_wsl}/eggnog_proteins.dmnd"
             
+            # Use pre-initialized HMM profiles (no setup, no hmmpress, no hmmfetch - all done at startup)
+            if not profiles_hmm:
+                logger.warning("⚠️  Pre-initialized HMM profiles not available, using full database")
+                profiles_hmm = f"{kofam_db_wsl}/profiles.hmm"
+            
+            # All pre-flight file checks for this job in one probe (the full eggNOG database is
+            # checked when Step 3 needs it - it may be rebuilt while Steps 1-2 run)
+            preflight = self._probe_paths([input_file_wsl, profiles_hmm], head_bytes=0)
+            
             # ============================================================================
-            # STEP 1: KofamScan (HMM) - RUN FIRST (Smart Pipeline Order)
+            # STEPS 1-2: KofamScan (HMM) + GUT FAST SEARCH (Tier-1) - RUN CONCURRENTLY
             # ============================================================================
+            # Both steps read the same input and write independent outputs, so they
+            # run side by side with the CPU cores split between them.
             if job:
                 try:
                     job.progress = 10
-                    job.progress_message = 'Running KofamScan (HMM) (Step 1/5)...'
+                    job.progress_message = 'Running KofamScan (HMM) and gut database search (Steps 1-2/5)...'
                     job.save(update_fields=['progress', 'progress_message'])
                 except Exception as e:
                     logger.warning(f"Could not update job progress: {e}")
-            logger.info(f"[{time.strftime('%H:%M:%S')}] STEP 5: Running KofamScan FIRST (Smart Pipeline Order)...")
-            logger.info(f"[{time.strftime('%H:%M:%S')}] Step 1: Running KofamScan (HMM) with {cpu_cores} CPU cores...")
+            logger.info(f"[{time.strftime('%H:%M:%S')}] STEP 5: Running KofamScan and GUT DIAMOND concurrently (Smart Pipeline Order)...")
             
             # Verify input file has sequences and is valid FASTA
-            check_input_cmd = f"test -s {input_file_wsl} && echo 'has_data' || echo 'empty'"
-            input_check = subprocess.run(['bash', '-c', check_input_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            if 'empty' in input_check.stdout:
+            if preflight[input_file_wsl]['size'] == 0:
                 error_msg = "Input FASTA file is empty or has no sequences"
                 logger.error(error_msg)
                 return {
@@ -1311,185 +2678,264 @@ except Exception as e:
                     'processing_time': time.time() - start_time
                 }
             
-            # Check if file has valid FASTA sequences (at least one sequence header)
-            check_fasta_cmd = f"grep -c '^>' {input_file_wsl} 2>/dev/null || echo '0'"
-            fasta_check = subprocess.run(['bash', '-c', check_fasta_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            try:
-                sequence_count = int(fasta_check.stdout.strip())
-                if sequence_count == 0:
-                    error_msg = "Input file does not contain valid FASTA sequences (no sequence headers found)"
-                    logger.error(error_msg)
-                    return {
-                        'success': False,
-                        'error': error_msg,
-                        'processing_time': time.time() - start_time
-                    }
-                logger.info(f"Input file contains {sequence_count} FASTA sequence(s)")
-            except (ValueError, AttributeError):
-                logger.warning("Could not verify FASTA sequence count, continuing anyway...")
+            # Characterize the input in one in-process pass (sequence count, residues, longest sequence)
+            sequence_count, residue_count, max_seq_len = self._fasta_quick_stats(input_file_wsl)
+            if sequence_count == 0:
+                error_msg = "Input file does not contain valid FASTA sequences (no sequence headers found)"
+                logger.error(error_msg)
+                return {
+                    'success': False,
+                    'error': error_msg,
+                    'processing_time': time.time() - start_time
+                }
+            logger.info(f"Input file contains {sequence_count} FASTA sequence(s), "
+                        f"{residue_count} residues (longest: {max_seq_len})")
+            
+            # Windows drives mounted under /mnt/<drive>/ go through a slow 9P bridge under WSL
+            if re.match(r'^/mnt/[a-z]/', input_file_wsl):
+                logger.warning(f"⚠️  Input file is on a Windows drive mount ({input_file_wsl}). "
+                               f"Store inputs on the Linux filesystem for much faster I/O.")
             
             kofamscan_results_file = str(temp_dir / "kofamscan.txt")
             kofamscan_results_wsl = self._to_wsl_path(kofamscan_results_file)
+            run_kofamscan = preflight[profiles_hmm]['exists'] and os.access(profiles_hmm, os.R_OK)
+            if not run_kofamscan:
+                logger.warning(f"Prebuilt profiles.hmm not found at {profiles_hmm}, skipping KofamScan")
+                kofamscan_results_file = None
             
-            # Use pre-initialized HMM profiles (no setup, no hmmpress, no hmmfetch - all done at startup)
-            if not profiles_hmm:
-                logger.warning("⚠️  Pre-initialized HMM profiles not available, using full database")
-                profiles_hmm = f"{kofam_db_wsl}/profiles.hmm"
+            gut_hits_file = None
+            gut_hits_found = False
+            db_to_use = gut_db_ramdisk if gut_db_ramdisk else gut_db_path
             
-            check_hmm_cmd = f"test -f {profiles_hmm} && test -r {profiles_hmm} && echo 'exists' || echo 'not_exists'"
-            check_result = subprocess.run(['bash', '-c', check_hmm_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-            
-            if 'exists' in check_result.stdout:
-                # Ensure HMM database is indexed (hmmpress)
-                self._ensure_hmmpress(profiles_hmm)
-                # Optimize KofamScan: Use faster options
-                # --max: Stop after first hit per sequence (faster, ~2x speedup)
-                # --cpu: Use all available cores
-                # --domE 1e-5: Relaxed E-value threshold (allows shorter/synthetic sequences to match)
-                # Note: Changed from --cut_tc (too strict) to --domE 1e-5 for better sensitivity
-                # Note: Using gut subset is already 10x faster than full database
-                # STEP 4: Use hmmsearch with cached HMMs (hmmpress already done)
-                # --max shows all hits, --domE 1e-5 allows shorter/synthetic sequences to match
-                # (Changed from --cut_tc which is too strict for short sequences)
-                kofamscan_cmd = f"""source ~/miniconda3/etc/profile.d/conda.sh && conda activate kofamscan && export HMMER_NCPU={cpu_cores} && hmmsearch --cpu {cpu_cores} --max --domE 1e-5 -o {kofamscan_results_wsl} {profiles_hmm} {input_file_wsl}"""
-                
-                logger.info(f"Command: {kofamscan_cmd}")
-                print(f"[{time.strftime('%H:%M:%S')}] Running KofamScan (optimized with gut subset, relaxed cutoffs): hmmsearch --cpu {cpu_cores} --max --domE 1e-5 -o {kofamscan_results_wsl} {profiles_hmm} {input_file_wsl}")
-                
-                # Run KofamScan (non-blocking, will process results later)
-                kofamscan_stdout_file = temp_dir / "kofamscan_stdout.log"
-                kofamscan_stderr_file = temp_dir / "kofamscan_stderr.log"
-                
-                with open(kofamscan_stdout_file, 'w', encoding='utf-8') as stdout_file, \
-                     open(kofamscan_stderr_file, 'w', encoding='utf-8') as stderr_file:
+            # Split cores ~50/50 when both searches run, otherwise give one search all of them
+            if run_kofamscan and db_to_use:
+                kofamscan_cpus = max(1, cpu_cores // 2)
+                diamond_cpus = max(1, cpu_cores - kofamscan_cpus)
+            else:
+                kofamscan_cpus = diamond_cpus = cpu_cores
+            
+            # Optional in-process HMM search (pyhmmer) instead of the hmmsearch binary
+            use_pyhmmer = run_kofamscan and pyhmmer is not None and getattr(settings, 'FASTA_PROCESSING_USE_PYHMMER', False)
+            kofamscan_stderr_file = temp_dir / "kofamscan_stderr.log"
+            
+            # Page in the on-disk search databases while the input is split and the searches start
+            # (a RAM disk copy is already in memory). hmmsearch and pyhmmer read only profiles.hmm,
+            # not the hmmpress index files
+            warm_paths = []
+            if db_to_use and db_to_use != gut_db_ramdisk:
+                warm_paths.append(db_to_use)
+            if run_kofamscan:
+                warm_paths.append(profiles_hmm)
+            if warm_paths:
+                self._warm_file_cache(warm_paths, ram_limit_gb)
+            
+            # Data-parallel mode for large inputs on big hosts: split the input at record
+            # boundaries and run one search per part (each tool's cores are divided between parts)
+            input_parts = [input_file_wsl]
+            if file_size_mb > 200 and cpu_cores >= 8:
+                n_parts = cpu_cores // 4
+                try:
+                    input_parts = self._split_fasta(input_file_wsl, temp_dir / "splits", n_parts)
+                    logger.info(f"[{time.strftime('%H:%M:%S')}] Split input into {len(input_parts)} parts for parallel searches")
+                except OSError as e:
+                    logger.warning(f"Could not split input FASTA ({e}), searching it as one file")
+                    input_parts = [input_file_wsl]
+            n_parts = len(input_parts)
+            
+            def part_output(path, index):
+                """Per-part output path (the real path when the input is not split)"""
+                return path if n_parts == 1 else f"{path}.part{index}"
+            
+            step_processes = {}
+            step_stderr_logs = {}
+            step_parsers = {}
+            step_return_codes = {}
+            with contextlib.ExitStack() as log_files:
+                if db_to_use:
+                    logger.info(f"[{time.strftime('%H:%M:%S')}] Step 2: Searching gut database with {diamond_cpus} CPU cores...")
+                    logger.info(f"[{time.strftime('%H:%M:%S')}] Using database: {db_to_use}")
                     
-                    kofamscan_process = _register_process(subprocess.Popen(
-                        ['bash', '-c', kofamscan_cmd],
-                        stdout=stdout_file,
-                        stderr=stderr_file,
-                        text=True
-                    ))
+                    gut_hits_file = str(temp_dir / "gut_hits.tsv")
+                    gut_hits_wsl = self._to_wsl_path(gut_hits_file)
                     
-                    # Allow sufficient time for KofamScan to complete (no strict timeout)
-                    timeout_seconds = self._calculate_timeout(file_size_mb, 'kofamscan', no_timeout=True)
-                    return_code, timed_out = self._monitor_process(
-                        kofamscan_process, timeout_seconds, job,
-                        step_message='Running KofamScan (Step 1/6) - Ensuring complete results',
-                        file_size_mb=file_size_mb
-                    )
+                    # stdout is never read (hits go to -o); the teed stderr log gets a large buffer
+                    diamond_stderr_file = temp_dir / "gut_diamond_stderr.log"
+                    stderr_log = log_files.enter_context(open(diamond_stderr_file, 'wb', buffering=1 << 20))
                     
-                    # Process is automatically unregistered by _monitor_process when it completes
+                    # STEP 3: Optimized DIAMOND parameters for speed
+                    # --block-size sized from RAM, --index-chunks 1 (tiny DB), --fast for maximum speed
+                    # (RAM and threads are shared between parallel parts)
+                    part_threads = max(1, diamond_cpus // n_parts)
+                    block_size, index_chunks = self._diamond_memory_options(ram_limit_gb / n_parts, small_db=True)
+                    for index, part_fasta in enumerate(input_parts):
+                        part_hits = part_output(gut_hits_wsl, index)
+                        diamond_cmd = f"""{_conda_prefix('eggnog')}diamond blastp -d {db_to_use} -q {part_fasta} -o {part_hits} --threads {part_threads} --block-size {block_size} --index-chunks {index_chunks} --fast --outfmt 6"""
+                        
+                        logger.info(f"Command: {diamond_cmd}")
+                        print(f"[{time.strftime('%H:%M:%S')}] Running GUT DIAMOND (Tier-1): diamond blastp -d {db_to_use} -q {part_fasta} -o {part_hits} --threads {part_threads} --fast")
+                        
+                        # stderr is piped so block progress can be followed live (copied to the log)
+                        step_processes[('gut_diamond', index)] = _register_process(subprocess.Popen(
+                            ['bash', '-c', diamond_cmd],
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE,
+                            start_new_session=True
+                        ))
+                        step_stderr_logs[('gut_diamond', index)] = stderr_log
+                        step_parsers[('gut_diamond', index)] = _parse_diamond_progress
+                
+                def start_hmmsearch():
+                    """Start one hmmsearch per input part (KofamScan via the binary)"""
+                    # Ensure HMM database is indexed (hmmpress)
+                    self._ensure_hmmpress(profiles_hmm)
+                    logger.info(f"[{time.strftime('%H:%M:%S')}] Step 1: Running KofamScan (HMM) with {kofamscan_cpus} CPU cores...")
                     
-                    # Read error output for diagnostics
-                    stderr_content = ""
-                    if os.path.exists(kofamscan_stderr_file):
-                        try:
-                            with open(kofamscan_stderr_file, 'r', encoding='utf-8', errors='ignore') as f:
-                                stderr_content = f.read()
-                        except Exception as e:
-                            logger.warning(f"Could not read KofamScan stderr: {e}")
+                    # Results go to -o, so stdout is discarded; stderr is kept for error reporting
+                    stderr_file = log_files.enter_context(open(kofamscan_stderr_file, 'w', encoding='utf-8'))
                     
-                    # Check if results file exists and has data, even if return code is non-zero
-                    if os.path.exists(kofamscan_results_file):
-                        # Check if file has data (not empty)
-                        check_kofam_data_cmd = f"test -s {kofamscan_results_wsl} && echo 'has_data' || echo 'empty'"
-                        kofam_data_check = subprocess.run(['bash', '-c', check_kofam_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                        if 'has_data' in kofam_data_check.stdout:
-                            logger.info(f"[{time.strftime('%H:%M:%S')}] Step 1: KofamScan completed successfully (found results despite return code {return_code})")
-                        else:
-                            error_details = stderr_content[-500:] if stderr_content else "No error details"
-                            logger.warning(f"KofamScan results file is empty (return code {return_code}). Error: {error_details}")
-                            kofamscan_results_file = None
-                    else:
-                        error_details = stderr_content[-500:] if stderr_content else "No error details"
-                        logger.warning(f"KofamScan results file not generated (return code {return_code}). Error: {error_details}")
-                        # Check for common errors
-                        if 'not found' in stderr_content or 'File existence' in stderr_content:
-                            logger.error(f"❌ KofamScan database file not accessible. Check: {profiles_hmm}")
-                        kofamscan_results_file = None
-            else:
-                logger.warning(f"Prebuilt profiles.hmm not found at {profiles_hmm}, skipping KofamScan")
-                kofamscan_results_file = None
-            
-            # ============================================================================
-            # STEP 2: EGGNOG ANNOTATION (emapper)
-            # ============================================================================
-            if job:
-                try:
-                    job.progress = 20
-                    job.progress_message = 'Running eggNOG annotation (Step 2/4)...'
-                    job.save(update_fields=['progress', 'progress_message'])
-                except Exception as e:
-                    logger.warning(f"Could not update job progress: {e}")
-            # ============================================================================
-            # STEP 2: GUT FAST SEARCH (PRIMARY - Tier-1) - 10x Speedup
-            # ============================================================================
-            gut_hits_file = None
-            remaining_fasta_wsl = None
-            gut_hits_found = False
-            
-            if gut_db_ramdisk or gut_db_path:
-                if job:
-                    try:
-                        job.progress = 30
-                        job.progress_message = 'Searching gut database (Step 2/5)...'
-                        job.save(update_fields=['progress', 'progress_message'])
-                    except Exception as e:
-                        logger.warning(f"Could not update job progress: {e}")
+                    part_cpus = max(1, kofamscan_cpus // n_parts)
+                    # -Z: score every part against the whole input so E-values match a single run
+                    z_option = f"-Z {sequence_count} " if n_parts > 1 else ""
+                    for index, part_fasta in enumerate(input_parts):
+                        part_results = part_output(kofamscan_results_wsl, index)
+                        # Optimize KofamScan: Use faster options
+                        # --max: Stop after first hit per sequence (faster, ~2x speedup)
+                        # --cpu: Use this step's share of the cores
+                        # --domE 1e-5: Relaxed E-value threshold (allows shorter/synthetic sequences to match)
+                        # Note: Changed from --cut_tc (too strict) to --domE 1e-5 for better sensitivity
+                        # Note: Using gut subset is already 10x faster than full database
+                        # STEP 4: Use hmmsearch with cached HMMs (hmmpress already done)
+                        # --max shows all hits, --domE 1e-5 allows shorter/synthetic sequences to match
+                        # (Changed from --cut_tc which is too strict for short sequences)
+                        kofamscan_cmd = f"""{_conda_prefix('kofamscan')}export HMMER_NCPU={part_cpus} && hmmsearch --cpu {part_cpus} --max --domE 1e-5 {z_option}-o {part_results} {profiles_hmm} {part_fasta}"""
+                        
+                        logger.info(f"Command: {kofamscan_cmd}")
+                        print(f"[{time.strftime('%H:%M:%S')}] Running KofamScan (optimized with gut subset, relaxed cutoffs): hmmsearch --cpu {part_cpus} --max --domE 1e-5 {z_option}-o {part_results} {profiles_hmm} {part_fasta}")
+                        
+                        step_processes[('kofamscan', index)] = _register_process(subprocess.Popen(
+                            ['bash', '-c', kofamscan_cmd],
+                            stdout=subprocess.DEVNULL,
+                            stderr=stderr_file,
+                            text=True,
+                            start_new_session=True
+                        ))
                 
-                db_to_use = gut_db_ramdisk if gut_db_ramdisk else gut_db_path
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Step 2: Searching gut database with {cpu_cores} CPU cores...")
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Using database: {db_to_use}")
+                def monitor_steps(processes, step_message):
+                    """Wait for the given step processes, recording each tool's first failing return code"""
+                    # No strict timeout - ensure complete results from both searches
+                    timeout_seconds = max(
+                        self._calculate_timeout(file_size_mb, 'kofamscan', no_timeout=True, residue_count=residue_count),
+                        self._calculate_timeout(file_size_mb, 'diamond', no_timeout=True, residue_count=residue_count)
+                    )
+                    return_codes, timed_out = self._monitor_processes(
+                        list(processes.values()), timeout_seconds, job,
+                        step_message=step_message,
+                        file_size_mb=file_size_mb,
+                        stderr_logs=[step_stderr_logs.get(key) for key in processes],
+                        progress_parsers=[step_parsers.get(key) for key in processes],
+                        progress_range=(10, 30)
+                    )
+                    # A tool's return code is the first failing part's code (0 if all parts succeeded)
+                    for (tool, _), return_code in zip(processes, return_codes):
+                        if step_return_codes.get(tool, 0) == 0:
+                            step_return_codes[tool] = return_code
+                    # Processes are automatically unregistered by _monitor_processes when they complete
                 
-                gut_hits_file = str(temp_dir / "gut_hits.tsv")
-                gut_hits_wsl = self._to_wsl_path(gut_hits_file)
+                pyhmmer_future = None
+                if use_pyhmmer:
+                    # In-process search on the shared pool while GUT DIAMOND runs, so DIAMOND's piped
+                    # stderr keeps being drained (and job progress saved) during the HMM search
+                    logger.info(f"[{time.strftime('%H:%M:%S')}] Step 1: Running KofamScan (HMM) in-process with pyhmmer ({kofamscan_cpus} CPU cores)...")
+                    pyhmmer_future = _IO_POOL.submit(
+                        self._run_pyhmmer_search,
+                        profiles_hmm, input_file_wsl, kofamscan_results_file, kofamscan_cpus,
+                        total_sequences=sequence_count
+                    )
+                elif run_kofamscan:
+                    start_hmmsearch()
                 
-                # STEP 3: Optimized DIAMOND parameters for speed
-                # --block-size 4, --index-chunks 1, --fast for maximum speed
-                diamond_cmd = f"""source ~/miniconda3/etc/profile.d/conda.sh && conda activate eggnog && diamond blastp -d {db_to_use} -q {input_file_wsl} -o {gut_hits_wsl} --threads {cpu_cores} --block-size 4 --index-chunks 1 --fast --outfmt 6"""
+                if step_processes:
+                    monitor_steps(dict(step_processes), 'Running KofamScan + GUT DIAMOND (Steps 1-2/5) - Ensuring complete results')
                 
-                logger.info(f"Command: {diamond_cmd}")
-                print(f"[{time.strftime('%H:%M:%S')}] Running GUT DIAMOND (Tier-1): diamond blastp -d {db_to_use} -q {input_file_wsl} -o {gut_hits_wsl} --threads {cpu_cores} --fast")
+                if pyhmmer_future is not None:
+                    pyhmmer_ok, pyhmmer_error = pyhmmer_future.result()
+                    if pyhmmer_ok:
+                        step_return_codes['kofamscan'] = 0
+                    else:
+                        # Fall back to hmmsearch (GUT DIAMOND has finished by now)
+                        logger.warning(f"⚠️  pyhmmer search failed ({pyhmmer_error}), falling back to hmmsearch")
+                        use_pyhmmer = False
+                        already_started = set(step_processes)
+                        start_hmmsearch()
+                        monitor_steps(
+                            {key: process for key, process in step_processes.items() if key not in already_started},
+                            'Running KofamScan (Step 1/5) - Ensuring complete results'
+                        )
+            
+            # Join per-part outputs (DIAMOND TSV rows and hmmsearch query blocks both concatenate)
+            if n_parts > 1:
+                for tool, combined in (('gut_diamond', gut_hits_file), ('kofamscan', kofamscan_results_file)):
+                    if combined and any(key[0] == tool for key in step_processes):
+                        self._concatenate_files([part_output(combined, index) for index in range(n_parts)], combined)
+            
+            if run_kofamscan:
+                return_code = step_return_codes.get('kofamscan', -1)
                 
-                diamond_stdout_file = temp_dir / "gut_diamond_stdout.log"
-                diamond_stderr_file = temp_dir / "gut_diamond_stderr.log"
+                # Read error output for diagnostics (errors are reported at the end of the log,
+                # and only the last 500 characters are ever logged)
+                stderr_content = ""
+                try:
+                    stderr_content = _read_log_tail(kofamscan_stderr_file, max_bytes=64 * 1024)
+                except Exception as e:
+                    logger.warning(f"Could not read KofamScan stderr: {e}")
                 
-                with open(diamond_stdout_file, 'w', encoding='utf-8') as stdout_file, \
-                     open(diamond_stderr_file, 'w', encoding='utf-8') as stderr_file:
-                    
-                    diamond_process = _register_process(subprocess.Popen(
-                        ['bash', '-c', diamond_cmd],
-                        stdout=stdout_file,
-                        stderr=stderr_file,
-                        text=True
-                    ))
-                    
-                    # No timeout limit - ensure complete results from gut database search
-                    timeout_seconds = self._calculate_timeout(file_size_mb, 'diamond', no_timeout=True)
-                    return_code, timed_out = self._monitor_process(
-                        diamond_process, timeout_seconds, job,
-                        step_message='Running GUT DIAMOND (Tier-1) - Searching small gut database',
-                        file_size_mb=file_size_mb
-                    )
-                    
-                    # Process is automatically unregistered by _monitor_process when it completes
+                # Check if results file exists and has data, even if return code is non-zero
+                if os.path.exists(kofamscan_results_file):
+                    # Check if file has data (not empty)
+                    if os.path.getsize(kofamscan_results_file) > 0:
+                        logger.info(f"[{time.strftime('%H:%M:%S')}] Step 1: KofamScan completed successfully (found results despite return code {return_code})")
+                    else:
+                        error_details = stderr_content[-500:] if stderr_content else "No error details"
+                        logger.warning(f"KofamScan results file is empty (return code {return_code}). Error: {error_details}")
+                        kofamscan_results_file = None
+                else:
+                    error_details = stderr_content[-500:] if stderr_content else "No error details"
+                    logger.warning(f"KofamScan results file not generated (return code {return_code}). Error: {error_details}")
+                    # Check for common errors
+                    if _KOFAM_DB_ACCESS_RE.search(stderr_content):
+                        logger.error(f"❌ KofamScan database file not accessible. Check: {profiles_hmm}")
+                    kofamscan_results_file = None
+            
+            if db_to_use:
+                return_code = step_return_codes.get('gut_diamond', -1)
                 
-                # Check if we got hits
+                # Count hits (non-empty TSV lines)
                 if os.path.exists(gut_hits_file):
-                    check_hits_cmd = f"wc -l < {gut_hits_wsl} 2>/dev/null || echo '0'"
-                    hits_check = subprocess.run(['bash', '-c', check_hits_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
+                    hit_count = 0
                     try:
-                        hit_count = int(hits_check.stdout.strip())
+                        if os.path.getsize(gut_hits_file) > 0:
+                            with open(gut_hits_file, 'rb', buffering=1 << 20) as hits_in:
+                                for line in hits_in:
+                                    if line.strip():
+                                        hit_count += 1
                         if hit_count > 0:
                             gut_hits_found = True
                             logger.info(f"[{time.strftime('%H:%M:%S')}] Step 2: Gut database search completed successfully ({hit_count} hits)")
                         else:
                             logger.info(f"[{time.strftime('%H:%M:%S')}] Step 2: Gut database search completed (no hits found - will search full eggNOG)")
-                    except (ValueError, AttributeError):
-                        logger.warning("Could not verify GUT hits count")
+                    except OSError as e:
+                        logger.warning(f"Could not verify GUT hits count: {e}")
                 else:
                     logger.warning(f"GUT DIAMOND search failed (return code {return_code})")
             
+            if job:
+                try:
+                    job.progress = 30
+                    job.progress_message = 'KofamScan and gut database search complete (Steps 1-2/5)'
+                    job.save(update_fields=['progress', 'progress_message'])
+                except Exception as e:
+                    logger.warning(f"Could not update job progress: {e}")
+            
             # SIMPLIFIED: If gut DB found ANY hits, skip full 40GB database (FAST MODE)
             skip_full_db_search = False
             if gut_hits_found and gut_hits_file:
@@ -1508,69 +2954,13 @@ except Exception as e:
                     logger.warning(f"Could not update job progress: {e}")
             
             fasta_for_eggnog = input_file_wsl
-            # Skip full DB search if gut DB found hits (FAST MODE)
-            if not skip_full_db_search:
-                if job:
-                    try:
-                        job.progress = 30
-                        job.progress_message = 'Filtering FASTA to remove gut hits (Step 3/5)...'
-                        job.save(update_fields=['progress', 'progress_message'])
-                    except Exception as e:
-                        logger.warning(f"Could not update job progress: {e}")
-                
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Step 3: Filtering FASTA to remove gut hits...")
-                
-                # Extract protein IDs from gut hits
-                extract_ids_cmd = f"cut -f1 {self._to_wsl_path(gut_hits_file)} | sort -u > {temp_dir_wsl}/gut_hit_ids.txt"
-                subprocess.run(['bash', '-c', extract_ids_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=60)
-                
-                # Create filtered FASTA (sequences NOT in gut hits)
-                remaining_fasta = str(temp_dir / "remaining.faa")
-                remaining_fasta_wsl = self._to_wsl_path(remaining_fasta)
-                
-                filter_cmd = f"""
-                python3 -c "
-                hit_ids = set()
-                with open('{temp_dir_wsl}/gut_hit_ids.txt', 'r') as f:
-                    hit_ids = set(line.strip() for line in f if line.strip())
-                
-                current_id = None
-                current_seq = []
-                write_current = False
-                
-                with open('{input_file_wsl}', 'r') as infile, open('{remaining_fasta_wsl}', 'w') as outfile:
-                    for line in infile:
-                        if line.startswith('>'):
-                            if current_id and current_id not in hit_ids:
-                                outfile.write('>' + current_id + '\\n')
-                                outfile.write(''.join(current_seq))
-                            header = line[1:].strip()
-                            current_id = header.split()[0]
-                            current_seq = []
-                            write_current = current_id not in hit_ids
-                        elif write_current:
-                            current_seq.append(line)
-                    if current_id and current_id not in hit_ids:
-                        outfile.write('>' + current_id + '\\n')
-                        outfile.write(''.join(current_seq))
-                "
-                """
-                
-                filter_result = subprocess.run(['bash', '-c', filter_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=300)
-                
-                if filter_result.returncode == 0 and os.path.exists(remaining_fasta):
-                    # Check how many sequences remain
-                    check_remaining_cmd = f"grep -c '^>' {remaining_fasta_wsl} 2>/dev/null || echo '0'"
-                    remaining_check = subprocess.run(['bash', '-c', check_remaining_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                    try:
-                        remaining_count = int(remaining_check.stdout.strip())
-                        logger.info(f"✅ Filtered FASTA: {remaining_count} sequences remaining (removed gut hits)")
-                        fasta_for_eggnog = remaining_fasta_wsl
-                    except (ValueError, AttributeError):
-                        fasta_for_eggnog = remaining_fasta_wsl
-                else:
-                    logger.warning("Could not filter FASTA, using original file for eggNOG")
-                    fasta_for_eggnog = input_file_wsl
+            # Steps 1-2 can run for hours: look at the full database now rather than at job start
+            full_db_size = self._probe_paths([eggnog_proteins_dmnd], head_bytes=0)[eggnog_proteins_dmnd]['size']
+            # Skip full DB search if gut DB found hits (FAST MODE). Otherwise the gut database
+            # found nothing to remove, so Step 4 searches the original input as is
+            if not skip_full_db_search and full_db_size > 0:
+                # Start paging in the full database before Step 4's DIAMOND search
+                self._warm_file_cache([eggnog_proteins_dmnd], ram_limit_gb)
             
             # ============================================================================
             # STEP 4: EGGNOG ANNOTATION (Tier-2) - Direct DIAMOND search on full database
@@ -1613,53 +3003,51 @@ except Exception as e:
             # Only run eggNOG search if we have sequences NOT found in gut database
             if sequences_to_search:
                 # Use DIAMOND directly on full eggnog database (much faster than emapper)
-                eggnog_proteins_dmnd = f"{eggnog_db_wsl}/eggnog_proteins.dmnd"
-                
-                # Check if full database exists
-                check_full_db_cmd = f"test -f {eggnog_proteins_dmnd} && test -s {eggnog_proteins_dmnd} && echo 'exists' || echo 'missing'"
-                full_db_check = subprocess.run(['bash', '-c', check_full_db_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                
-                if 'exists' in full_db_check.stdout:
+                # Check if full database exists (probed after Steps 1-2)
+                if full_db_size > 0:
                     logger.info(f"[{time.strftime('%H:%M:%S')}] Step 3: Running DIAMOND on full eggNOG database...")
                     
                     full_diamond_hits_file = str(temp_dir / "full_eggnog_hits.tsv")
                     full_diamond_hits_wsl = self._to_wsl_path(full_diamond_hits_file)
                     
-                    # OPTIMIZED DIAMOND parameters for speed (STEP 3)
-                    diamond_cmd = f"""source ~/miniconda3/etc/profile.d/conda.sh && conda activate eggnog && diamond blastp -d {eggnog_proteins_dmnd} -q {fasta_for_eggnog} -o {full_diamond_hits_wsl} --threads {cpu_cores} --block-size 4 --index-chunks 1 --fast --outfmt 6 qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore"""
+                    # OPTIMIZED DIAMOND parameters for speed (STEP 3), memory options sized from RAM
+                    block_size, index_chunks = self._diamond_memory_options(ram_limit_gb)
+                    diamond_cmd = f"""{_conda_prefix('eggnog')}diamond blastp -d {eggnog_proteins_dmnd} -q {fasta_for_eggnog} -o {full_diamond_hits_wsl} --threads {cpu_cores} --block-size {block_size} --index-chunks {index_chunks} --fast --outfmt 6 qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore"""
                     
                     logger.info(f"Command: {diamond_cmd}")
                     print(f"[{time.strftime('%H:%M:%S')}] Running DIAMOND on full eggNOG database: diamond blastp -d {eggnog_proteins_dmnd} -q {fasta_for_eggnog} -o {full_diamond_hits_wsl} --threads {cpu_cores} --fast")
                     
-                    diamond_stdout_file = temp_dir / "full_diamond_stdout.log"
                     diamond_stderr_file = temp_dir / "full_diamond_stderr.log"
                     
-                    with open(diamond_stdout_file, 'w', encoding='utf-8') as stdout_file, \
-                         open(diamond_stderr_file, 'w', encoding='utf-8') as stderr_file:
+                    with open(diamond_stderr_file, 'wb', buffering=1 << 20) as stderr_file:
                         
+                        # stderr is piped so block progress can be followed live (copied to the log);
+                        # stdout is never read (hits go to -o)
                         diamond_process = _register_process(subprocess.Popen(
                             ['bash', '-c', diamond_cmd],
-                            stdout=stdout_file,
-                            stderr=stderr_file,
-                            text=True
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE,
+                            start_new_session=True
                         ))
                         
                         # Calculate timeout for DIAMOND search
-                        timeout_seconds = self._calculate_timeout(file_size_mb, 'diamond', no_timeout=True)
-                        return_code, timed_out = self._monitor_process(
-                            diamond_process, timeout_seconds, job,
+                        timeout_seconds = self._calculate_timeout(file_size_mb, 'diamond', no_timeout=True, residue_count=residue_count)
+                        return_codes, timed_out = self._monitor_processes(
+                            [diamond_process], timeout_seconds, job,
                             step_message='Running DIAMOND on full eggNOG database (Step 4/5) - Fast search',
-                            file_size_mb=file_size_mb
+                            file_size_mb=file_size_mb,
+                            stderr_logs=[stderr_file],
+                            progress_parsers=[_parse_diamond_progress],
+                            progress_range=(40, 60)
                         )
+                        return_code = return_codes[0]
                         
                         # Process is automatically unregistered by _monitor_process when it completes
                     
                     # Check if we got hits
                     if os.path.exists(full_diamond_hits_file):
-                        check_hits_cmd = f"wc -l < {full_diamond_hits_wsl} 2>/dev/null || echo '0'"
-                        hits_check = subprocess.run(['bash', '-c', check_hits_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
                         try:
-                            hit_count = int(hits_check.stdout.strip())
+                            hit_count = self._count_lines(full_diamond_hits_file)
                             if hit_count > 0:
                                 logger.info(f"[{time.strftime('%H:%M:%S')}] Step 3: Full eggNOG search completed successfully ({hit_count} hits)")
                                 
@@ -1669,20 +3057,17 @@ except Exception as e:
                                 
                                 emapper_annotations_file = f"{emapper_output_wsl}.emapper.annotations"
                                 # Use timeout to prevent hanging (5 minutes max for annotation conversion)
-                                annotate_cmd = f"""source ~/miniconda3/etc/profile.d/conda.sh && conda activate eggnog && timeout 300 emapper.py -i {fasta_for_eggnog} -o {emapper_output_wsl} --data_dir {eggnog_db_wsl} --annotate_hits_table {full_diamond_hits_wsl} --cpu {cpu_cores} --override 2>&1 || echo 'annotation_failed'"""
+                                annotate_cmd = f"""{_conda_prefix('eggnog')}timeout 300 emapper.py -i {fasta_for_eggnog} -o {emapper_output_wsl} --data_dir {eggnog_db_wsl} --annotate_hits_table {full_diamond_hits_wsl} --cpu {cpu_cores} --override 2>&1 || echo 'annotation_failed'"""
                                 
-                                annotate_result = subprocess.run(['bash', '-c', annotate_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=600)
+                                annotate_returncode, annotate_output = _sh(annotate_cmd, 600)
                                 
                                 # Log annotation conversion result for debugging
-                                if annotate_result.returncode != 0:
-                                    error_output = annotate_result.stderr[-500:] if annotate_result.stderr else annotate_result.stdout[-500:]
-                                    logger.warning(f"[{time.strftime('%H:%M:%S')}] emapper annotation conversion failed (return code {annotate_result.returncode}): {error_output}")
+                                if annotate_returncode != 0:
+                                    error_output = annotate_output[-500:].decode('utf-8', errors='replace')
+                                    logger.warning(f"[{time.strftime('%H:%M:%S')}] emapper annotation conversion failed (return code {annotate_returncode}): {error_output}")
                                 
                                 # Check if annotation file was created
-                                check_annotations_cmd = f"test -f {emapper_annotations_file} && test -s {emapper_annotations_file} && echo 'has_data' || echo 'empty'"
-                                annotations_check = subprocess.run(['bash', '-c', check_annotations_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                                
-                                if 'has_data' in annotations_check.stdout:
+                                if os.path.isfile(emapper_annotations_file) and os.path.getsize(emapper_annotations_file) > 0:
                                     emapper_has_output = True
                                     logger.info(f"[{time.strftime('%H:%M:%S')}] Step 4: Successfully converted DIAMOND hits to annotations")
                                 else:
@@ -1697,7 +3082,7 @@ except Exception as e:
                                 logger.info(f"[{time.strftime('%H:%M:%S')}] Step 4: DIAMOND search completed (no hits found)")
                                 emapper_annotations_file = None
                                 emapper_has_output = False
-                        except (ValueError, AttributeError):
+                        except OSError:
                             logger.warning("Could not verify DIAMOND hits count")
                             emapper_annotations_file = None
                             emapper_has_output = False
@@ -1717,155 +3102,118 @@ except Exception as e:
             # ============================================================================
             logger.info(f"[{time.strftime('%H:%M:%S')}] Step 4: Merging results from all sources...")
             
-            # Process emapper annotations if available
-            emapper_enzymes_file = None
-            if emapper_annotations_file and os.path.exists(emapper_annotations_file):
-                emapper_enzymes_file = str(temp_dir / "emapper_enzymes.csv")
-                emapper_enzymes_wsl = self._to_wsl_path(emapper_enzymes_file)
-                
-                success, result = self._run_script_template(
-                    "extract_enzymes",
-                    {
-                        "EGGNOG_DB_PATH": eggnog_db_wsl,
-                        "ANNOTATIONS_FILE": emapper_annotations_file,
-                        "OUTPUT_FILE": emapper_enzymes_wsl
-                    },
-                    temp_dir,
-                    conda_env='eggnog',
-                    timeout=300,
-                    step_name='extract emapper enzymes'
-                )
-                
-                # Check if processed file has data (more than just headers)
-                if success and os.path.exists(emapper_enzymes_file):
-                    check_data_cmd = f"wc -l < {emapper_enzymes_wsl}"
-                    line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                    try:
-                        line_count = int(line_count_result.stdout.strip())
-                        if line_count <= 1:  # Only headers, no data
-                            logger.warning("Warning: emapper_enzymes.csv has no data rows, skipping")
-                            emapper_enzymes_file = None
+            # The three sources are extracted from independent files, so their script chains
+            # run concurrently (each chain stays sequential: fallback / convert -> process)
+            def extract_emapper_enzymes():
+                """emapper annotations (or the full DIAMOND hits fallback) -> emapper_enzymes.csv"""
+                enzymes_file = None
+                if emapper_annotations_file and os.path.exists(emapper_annotations_file):
+                    enzymes_file = str(temp_dir / "emapper_enzymes.csv")
+                    
+                    success, result = self._run_script_template(
+                        "extract_enzymes",
+                        {
+                            "EGGNOG_DB_PATH": eggnog_db_wsl,
+                            "ANNOTATIONS_FILE": emapper_annotations_file,
+                            "OUTPUT_FILE": self._to_wsl_path(enzymes_file)
+                        },
+                        temp_dir,
+                        conda_env='eggnog',
+                        timeout=300,
+                        step_name='extract emapper enzymes'
+                    )
+                    
+                    # Check if processed file has data (more than just headers)
+                    if success:
+                        row_count = self._csv_data_row_count(enzymes_file)
+                        if row_count:
+                            logger.info(f"✅ Extracted {row_count} enzyme annotations from emapper")
                         else:
-                            logger.info(f"✅ Extracted {line_count - 1} enzyme annotations from emapper")
-                    except (ValueError, AttributeError):
-                        logger.warning("Warning: Could not verify emapper_enzymes.csv data, skipping")
-                        emapper_enzymes_file = None
-                else:
-                    logger.warning("Warning: Could not extract emapper enzymes, continuing without them")
-                    emapper_enzymes_file = None
-            
-            # FALLBACK: Process full DIAMOND hits directly if emapper annotation conversion failed
-            if not emapper_enzymes_file and full_diamond_hits_for_processing and os.path.exists(full_diamond_hits_for_processing):
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Fallback: Processing full DIAMOND hits directly (emapper annotation conversion failed)...")
-                emapper_enzymes_file = str(temp_dir / "emapper_enzymes.csv")
-                emapper_enzymes_wsl = self._to_wsl_path(emapper_enzymes_file)
-                
-                # Try to find ko2genes file for full eggNOG database
-                # Check common locations
-                ko2genes_candidates = [
-                    f"{eggnog_db_wsl}/eggnog.db",
-                    f"{eggnog_db_wsl}/ko2genes.txt",
-                    f"{eggnog_db_wsl}/gut_kegg_db/ko2genes.txt"
-                ]
-                ko2genes_file = None
-                for candidate in ko2genes_candidates:
-                    check_cmd = f"test -f {candidate} && echo 'exists' || echo 'missing'"
-                    check_result = subprocess.run(['bash', '-c', check_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                    if 'exists' in check_result.stdout:
-                        ko2genes_file = candidate
-                        break
-                
-                # Process DIAMOND hits using process_diamond_hits template
-                # Note: This will extract KOs from subject IDs if ko2genes not available
-                success, result = self._run_script_template(
-                    "process_diamond_hits",
-                    {
-                        "DIAMOND_HITS": self._to_wsl_path(full_diamond_hits_for_processing),
-                        "KO2GENES_FILE": ko2genes_file if ko2genes_file else "None",
-                        "OUTPUT_FILE": emapper_enzymes_wsl
-                    },
-                    temp_dir,
-                    conda_env='eggnog',
-                    timeout=300,
-                    step_name='process full DIAMOND hits (fallback)'
-                )
+                            logger.warning("Warning: emapper_enzymes.csv has no data rows, skipping")
+                            enzymes_file = None
+                    else:
+                        logger.warning("Warning: Could not extract emapper enzymes, continuing without them")
+                        enzymes_file = None
                 
-                # Check if processed file has data (more than just headers)
-                if success and os.path.exists(emapper_enzymes_file):
-                    check_data_cmd = f"wc -l < {emapper_enzymes_wsl}"
-                    line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                    try:
-                        line_count = int(line_count_result.stdout.strip())
-                        if line_count > 1:  # Has data rows
-                            logger.info(f"✅ Fallback: Extracted {line_count - 1} enzyme annotations from full DIAMOND hits")
+                # FALLBACK: Process full DIAMOND hits directly if emapper annotation conversion failed
+                if not enzymes_file and full_diamond_hits_for_processing and os.path.exists(full_diamond_hits_for_processing):
+                    logger.info(f"[{time.strftime('%H:%M:%S')}] Fallback: Processing full DIAMOND hits directly (emapper annotation conversion failed)...")
+                    enzymes_file = str(temp_dir / "emapper_enzymes.csv")
+                    
+                    # Try to find ko2genes file for full eggNOG database
+                    # Check common locations
+                    ko2genes_candidates = [
+                        f"{eggnog_db_wsl}/eggnog.db",
+                        f"{eggnog_db_wsl}/ko2genes.txt",
+                        f"{eggnog_db_wsl}/gut_kegg_db/ko2genes.txt"
+                    ]
+                    ko2genes_file = None
+                    for candidate in ko2genes_candidates:
+                        if os.path.isfile(candidate):
+                            ko2genes_file = candidate
+                            break
+                    
+                    # Process DIAMOND hits using process_diamond_hits template
+                    # Note: This will extract KOs from subject IDs if ko2genes not available
+                    success, result = self._run_script_template(
+                        "process_diamond_hits",
+                        {
+                            "DIAMOND_HITS": self._to_wsl_path(full_diamond_hits_for_processing),
+                            "KO2GENES_FILE": ko2genes_file if ko2genes_file else "None",
+                            "OUTPUT_FILE": self._to_wsl_path(enzymes_file)
+                        },
+                        temp_dir,
+                        conda_env='eggnog',
+                        timeout=300,
+                        step_name='process full DIAMOND hits (fallback)'
+                    )
+                    
+                    # Check if processed file has data (more than just headers)
+                    if success:
+                        row_count = self._csv_data_row_count(enzymes_file)
+                        if row_count:
+                            logger.info(f"✅ Fallback: Extracted {row_count} enzyme annotations from full DIAMOND hits")
                         else:
                             logger.warning("Warning: Full DIAMOND hits processing produced no data rows")
-                            emapper_enzymes_file = None
-                    except (ValueError, AttributeError):
-                        logger.warning("Warning: Could not verify full DIAMOND hits processing data, skipping")
-                        emapper_enzymes_file = None
-                else:
-                    logger.warning("Warning: Could not process full DIAMOND hits, continuing without them")
-                    emapper_enzymes_file = None
-            
-            # Process kofamscan results if available
-            kofamscan_kos_file = None
-            if kofamscan_results_file and os.path.exists(kofamscan_results_file):
-                # Convert hmmsearch output first
-                converted_results_file = str(temp_dir / "kofamscan_results_converted.txt")
-                converted_results_wsl = self._to_wsl_path(converted_results_file)
+                            enzymes_file = None
+                    else:
+                        logger.warning("Warning: Could not process full DIAMOND hits, continuing without them")
+                        enzymes_file = None
+                return enzymes_file
+            
+            def extract_kofam_kos():
+                """hmmsearch results -> kofamscan_kos.csv (parse and tabulate in one script)"""
+                if not (kofamscan_results_file and os.path.exists(kofamscan_results_file)):
+                    return None
                 
+                kos_file = str(temp_dir / "kofamscan_kos.csv")
                 success, result = self._run_script_template(
-                    "convert_hmmsearch",
+                    "kofam_kos",
                     {
                         "INPUT_FILE": kofamscan_results_wsl,
-                        "OUTPUT_FILE": converted_results_wsl
+                        "OUTPUT_FILE": self._to_wsl_path(kos_file)
                     },
                     temp_dir,
                     conda_env='kofamscan',
-                    timeout=300,
-                    step_name='convert hmmsearch'
+                    timeout=600,
+                    step_name='process kofamscan'
                 )
                 
-                if success and os.path.exists(converted_results_file):
-                    kofamscan_kos_file = str(temp_dir / "kofamscan_kos.csv")
-                    kofamscan_kos_wsl = self._to_wsl_path(kofamscan_kos_file)
-                    
-                    success, result = self._run_script_template(
-                        "process_kofam",
-                        {
-                            "INPUT_FILE": converted_results_wsl,
-                            "OUTPUT_FILE": kofamscan_kos_wsl
-                        },
-                        temp_dir,
-                        conda_env='kofamscan',
-                        timeout=600,
-                        step_name='process kofamscan'
-                    )
-                    
-                    # Check if processed file has data (more than just headers)
-                    if success and os.path.exists(kofamscan_kos_file):
-                        check_data_cmd = f"wc -l < {kofamscan_kos_wsl}"
-                        line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                        try:
-                            line_count = int(line_count_result.stdout.strip())
-                            if line_count <= 1:  # Only headers, no data
-                                logger.warning("Warning: kofamscan_kos.csv has no data rows, skipping")
-                                kofamscan_kos_file = None
-                            else:
-                                logger.info(f"✅ Processed {line_count - 1} KOs from kofamscan")
-                        except (ValueError, AttributeError):
-                            logger.warning("Warning: Could not verify kofamscan_kos.csv data, skipping")
-                            kofamscan_kos_file = None
-                    else:
-                        kofamscan_kos_file = None
+                # Check if processed file has data (more than just headers)
+                row_count = self._csv_data_row_count(kos_file) if success else 0
+                if row_count:
+                    logger.info(f"✅ Processed {row_count} KOs from kofamscan")
+                    return kos_file
+                if success:
+                    logger.warning("Warning: kofamscan_kos.csv has no data rows, skipping")
+                return None
             
-            # Process gut hits if available
-            gut_enzymes_file = None
-            if gut_hits_file and os.path.exists(gut_hits_file) and gut_hits_found:
+            def extract_gut_enzymes():
+                """Gut DIAMOND hits -> gut_enzymes.csv"""
+                if not (gut_hits_file and os.path.exists(gut_hits_file) and gut_hits_found):
+                    return None
                 # Process gut DIAMOND hits to extract enzyme annotations
-                gut_enzymes_file = str(temp_dir / "gut_enzymes.csv")
-                gut_enzymes_wsl = self._to_wsl_path(gut_enzymes_file)
+                enzymes_file = str(temp_dir / "gut_enzymes.csv")
                 
                 # Use the existing process_diamond_hits script template
                 ko2genes_file = f"{eggnog_db_wsl}/gut_kegg_db/ko2genes.txt"
@@ -1874,7 +3222,7 @@ except Exception as e:
                     {
                         "DIAMOND_HITS": self._to_wsl_path(gut_hits_file),
                         "KO2GENES_FILE": ko2genes_file,
-                        "OUTPUT_FILE": gut_enzymes_wsl
+                        "OUTPUT_FILE": self._to_wsl_path(enzymes_file)
                     },
                     temp_dir,
                     conda_env='eggnog',
@@ -1882,57 +3230,28 @@ except Exception as e:
                     step_name='process gut hits'
                 )
                 
-                if success and os.path.exists(gut_enzymes_file):
-                    check_data_cmd = f"wc -l < {gut_enzymes_wsl}"
-                    line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                    try:
-                        line_count = int(line_count_result.stdout.strip())
-                        if line_count > 1:
-                            logger.info(f"✅ Processed {line_count - 1} enzyme annotations from GUT hits")
-                        else:
-                            gut_enzymes_file = None
-                    except (ValueError, AttributeError):
-                        gut_enzymes_file = None
-                else:
-                    gut_enzymes_file = None
+                row_count = self._csv_data_row_count(enzymes_file) if success else 0
+                if row_count:
+                    logger.info(f"✅ Processed {row_count} enzyme annotations from GUT hits")
+                    return enzymes_file
+                return None
+            
+            emapper_future = _IO_POOL.submit(extract_emapper_enzymes)
+            kofam_future = _IO_POOL.submit(extract_kofam_kos)
+            gut_future = _IO_POOL.submit(extract_gut_enzymes)
+            emapper_enzymes_file = emapper_future.result()
+            kofamscan_kos_file = kofam_future.result()
+            gut_enzymes_file = gut_future.result()
             
             # Merge all available sources
             merged_file = str(temp_dir / "enzymes_merged.csv")
             merged_file_wsl = self._to_wsl_path(merged_file)
             
-            # Check if at least one source has data
-            has_gut_data = gut_enzymes_file and os.path.exists(gut_enzymes_file)
-            has_emapper_data = emapper_enzymes_file and os.path.exists(emapper_enzymes_file)
-            has_kofam_data = kofamscan_kos_file and os.path.exists(kofamscan_kos_file)
-            
-            # Verify gut data file has actual data
-            if has_gut_data:
-                check_data_cmd = f"wc -l < {self._to_wsl_path(gut_enzymes_file)}"
-                line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                try:
-                    if int(line_count_result.stdout.strip()) <= 1:
-                        has_gut_data = False
-                except (ValueError, AttributeError):
-                    has_gut_data = False
-            
-            # Verify files have actual data (not just headers)
-            if has_emapper_data:
-                check_data_cmd = f"wc -l < {self._to_wsl_path(emapper_enzymes_file)}"
-                line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                try:
-                    if int(line_count_result.stdout.strip()) <= 1:
-                        has_emapper_data = False
-                except (ValueError, AttributeError):
-                    has_emapper_data = False
-            
-            if has_kofam_data:
-                check_data_cmd = f"wc -l < {self._to_wsl_path(kofamscan_kos_file)}"
-                line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                try:
-                    if int(line_count_result.stdout.strip()) <= 1:
-                        has_kofam_data = False
-                except (ValueError, AttributeError):
-                    has_kofam_data = False
+            # Check if at least one source has data (not just headers). Each source file was
+            # reset to None above unless its row count was positive, so no re-check is needed
+            has_gut_data = gut_enzymes_file is not None
+            has_emapper_data = emapper_enzymes_file is not None
+            has_kofam_data = kofamscan_kos_file is not None
             
             skip_merge = False
             if not (has_gut_data or has_emapper_data or has_kofam_data):
@@ -1954,15 +3273,11 @@ except Exception as e:
                 
                 logger.error(error_msg)
                 
-                # Create empty CSV with headers
-                with open(output_file, 'w', encoding='utf-8') as f:
+                # Header-only merged CSV; it is copied to output_file like a real merge result
+                with open(merged_file, 'w', encoding='utf-8') as f:
                     f.write('protein_id,contig_id,EC_number,KEGG_KO,enzyme_name,pathway,confidence_score,annotation_source\n')
-                logger.warning(f"Created empty output file: {output_file}")
                 logger.warning("⚠️  Processing will continue but no annotation data is available.")
                 # Continue to pathway scoring and final FASTA creation (they will handle empty data)
-                # But skip the merge step
-                merged_file = output_file
-                merged_file_wsl = output_file_wsl
                 # Skip merge and go directly to pathway scoring
                 skip_merge = True
             
@@ -2052,30 +3367,31 @@ except Exception as e:
                         'processing_time': time.time() - start_time
                     }
                 
-                # Copy final merged result to output location
-                if os.path.exists(merged_file):
-                    shutil.copy2(merged_file, output_file)
-                    logger.info(f"[{time.strftime('%H:%M:%S')}] Step 3: Merge completed successfully")
-                    logger.info(f"Final CSV output saved to: {output_file}")
-                else:
-                    error_msg = 'merged enzymes.csv not generated'
-                    logger.error(error_msg)
-                    return {
-                        'success': False,
-                        'error': error_msg,
-                        'processing_time': time.time() - start_time
-                    }
+                logger.info(f"[{time.strftime('%H:%M:%S')}] Step 3: Merge completed successfully")
             else:
-                # Skip merge - empty file already created
+                # Skip merge - header-only merged file already created
                 logger.info(f"[{time.strftime('%H:%M:%S')}] Step 3: Skipped merge (no data found), using empty output file")
             
+            # Copy final merged result to output location
+            if os.path.exists(merged_file):
+                shutil.copy2(merged_file, output_file)
+                logger.info(f"Final CSV output saved to: {output_file}")
+            else:
+                error_msg = 'merged enzymes.csv not generated'
+                logger.error(error_msg)
+                return {
+                    'success': False,
+                    'error': error_msg,
+                    'processing_time': time.time() - start_time
+                }
+            
             # ============================================================================
             # STEP 4: Merge Results and Calculate Pathway Scores
             # ============================================================================
             if job:
                 try:
                     job.progress = 60
-                    job.progress_message = 'Merging results and calculating pathway scores (Step 4/5)...'
+                    job.progress_message = 'Calculating pathway scores and creating final FASTA (Steps 4-6)...'
                     job.save(update_fields=['progress', 'progress_message'])
                 except Exception as e:
                     logger.warning(f"Could not update job progress: {e}")
@@ -2096,23 +3412,43 @@ except Exception as e:
             pathway_output_file_wsl = self._to_wsl_path(pathway_output_file)
             
             # Path to pathway_definitions.csv (in fasta_processor directory)
-            pathway_defs_path = Path(__file__).parent / "pathway_definitions.csv"
+            pathway_defs_path = _APP_DIR / "pathway_definitions.csv"
             pathway_defs_wsl = self._to_wsl_path(str(pathway_defs_path))
             
-            # Calculate pathway scores using template
-            success, result = self._run_script_template(
+            # Check if merged CSV has data (not just headers); the final FASTA is only created then
+            has_annotation_data = self._csv_has_data_rows(merged_file)
+            
+            # Pathway scoring (Step 4) and final FASTA creation (Step 6) both only read the merged
+            # CSV and use the eggnog env, so they run concurrently from one shell
+            script_steps = [(
                 "pathway_scoring",
                 {
                     "ENZYMES_CSV": merged_file_wsl,
                     "PATHWAY_DEFS": pathway_defs_wsl,
                     "OUTPUT_FILE": pathway_output_file_wsl
                 },
-                temp_dir,
-                conda_env='eggnog',
-                timeout=600,
-                step_name='pathway scoring'
-            )
+                'pathway scoring'
+            )]
+            final_fasta_file = None
+            if has_annotation_data:
+                # Create final FASTA file path (same location as CSV, with .fasta extension)
+                final_fasta_file = str(Path(output_file).with_suffix('.fasta'))
+                final_fasta_file_wsl = self._to_wsl_path(final_fasta_file)
+                script_steps.append((
+                    "create_fasta",
+                    {
+                        "MERGED_CSV": merged_file_wsl,
+                        "INPUT_FASTA": input_file_wsl,
+                        "OUTPUT_FASTA": final_fasta_file_wsl
+                    },
+                    'create final FASTA'
+                ))
+            script_results = self._run_script_template_batch(script_steps, temp_dir, conda_env='eggnog', timeout=600, parallel=True)
             
+            # Pathway file reference and Step 6 progress are saved to the job together below
+            job_update_fields = []
+            
+            success, result = script_results[0]
             if not success:
                 logger.warning(f"Warning: Pathway scoring failed: {result.stderr[-1000:] if result.stderr else 'No error output'}")
             elif os.path.exists(pathway_output_file):
@@ -2120,64 +3456,27 @@ except Exception as e:
                 logger.info(f"Pathway scores saved to: {pathway_output_file}")
                 # Save pathway file reference to job
                 if job:
-                    media_root = Path(settings.MEDIA_ROOT) if not isinstance(settings.MEDIA_ROOT, Path) else settings.MEDIA_ROOT
-                    pathway_file_relative = Path(pathway_output_file).relative_to(media_root)
-                    job.pathway_file.name = str(pathway_file_relative)
-                    try:
-                        job.save(update_fields=['pathway_file'])
-                    except Exception as e:
-                        logger.warning(f"Could not update job pathway_file: {e}")
+                    job.pathway_file.name = _media_relative(pathway_output_file, settings.MEDIA_ROOT)
+                    job_update_fields.append('pathway_file')
             else:
                 logger.warning("Warning: Pathway scores file was not created, but processing will continue")
             
             # ============================================================================
             # STEP 6: Create final merged FASTA file (optional - only if data exists)
             # ============================================================================
-            # Check if merged CSV has data (not just headers)
-            has_annotation_data = False
-            if os.path.exists(merged_file):
-                check_data_cmd = f"wc -l < {merged_file_wsl}"
-                line_count_result = subprocess.run(['bash', '-c', check_data_cmd], capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=10)
-                try:
-                    line_count = int(line_count_result.stdout.strip())
-                    has_annotation_data = line_count > 1  # More than just header row
-                except (ValueError, AttributeError):
-                    has_annotation_data = False
-            
-            # Initialize final_fasta_file variable
-            final_fasta_file = None
-            
+            final_fasta_exists = False
             if has_annotation_data:
                 if job:
-                    try:
-                        job.progress = 90
-                        job.progress_message = 'Creating final FASTA file (Step 6/6)...'
-                        job.save(update_fields=['progress', 'progress_message'])
-                    except Exception as e:
-                        logger.warning(f"Could not update job progress: {e}")
-                logger.info(f"[{time.strftime('%H:%M:%S')}] Step 6: Creating final merged FASTA file...")
-                
-                # Create final FASTA file path (same location as CSV, with .fasta extension)
-                final_fasta_file = str(Path(output_file).with_suffix('.fasta'))
-                final_fasta_file_wsl = self._to_wsl_path(final_fasta_file)
-                
-                # Create final FASTA file using template
-                success, result = self._run_script_template(
-                    "create_fasta",
-                    {
-                        "MERGED_CSV": merged_file_wsl,
-                        "INPUT_FASTA": input_file_wsl,
-                        "OUTPUT_FASTA": final_fasta_file_wsl
-                    },
-                    temp_dir,
-                    conda_env='eggnog',
-                    timeout=600,
-                    step_name='create final FASTA'
-                )
+                    job.progress = 90
+                    job.progress_message = 'Final FASTA file created (Step 6/6)'
+                    job_update_fields += ['progress', 'progress_message']
                 
+                # Created together with the pathway scores above
+                success, result = script_results[1]
+                final_fasta_exists = success and os.path.exists(final_fasta_file)
                 if not success:
                     logger.warning(f"Warning: Final FASTA file creation failed: {result.stderr[-1000:] if result.stderr else 'No error output'}")
-                elif os.path.exists(final_fasta_file):
+                elif final_fasta_exists:
                     logger.info(f"[{time.strftime('%H:%M:%S')}] Final merged FASTA file created successfully")
                     logger.info(f"Final FASTA file saved to: {final_fasta_file}")
                 else:
@@ -2186,12 +3485,18 @@ except Exception as e:
                 logger.info(f"[{time.strftime('%H:%M:%S')}] Step 7: Skipping FASTA file creation (no annotation data found)")
                 logger.info("   FASTA file will only be created when annotations are found")
             
+            if job and job_update_fields:
+                try:
+                    job.save(update_fields=job_update_fields)
+                except Exception as e:
+                    logger.warning(f"Could not update job pathway_file/progress: {e}")
+            
             processing_time = time.time() - start_time
             logger.info(f"[{time.strftime('%H:%M:%S')}] ✅ All processing completed in {processing_time:.2f} seconds")
             
             # Return final FASTA file path if it was created
             final_fasta_path = None
-            if final_fasta_file and os.path.exists(final_fasta_file):
+            if final_fasta_exists:
                 final_fasta_path = final_fasta_file
                 logger.info(f"Final merged FASTA file available at: {final_fasta_path}")
             
@@ -2227,6 +3532,10 @@ except Exception as e:
                 'error': error_msg,
                 'processing_time': time.time() - start_time
             }
+        finally:
+            # Intermediates on the RAM disk would otherwise hold memory across jobs
+            if temp_dir_on_ramdisk:
+                shutil.rmtree(temp_dir, ignore_errors=True)
     
     def _to_wsl_path(self, path_input):
         """
@@ -2239,47 +3548,22 @@ except Exception as e:
         Returns:
             Linux-style path (e.g., /home/... or /mnt/...)
         """
-        if isinstance(path_input, Path):
-            path_str = str(path_input)
-        else:
-            path_str = path_input
-        
-        # Normalize backslashes to forward slashes
-        path_str = path_str.replace('\\', '/')
-        
-        # If already a Linux path (starts with /home, /usr, /opt, /mnt, etc.), return as is
-        if path_str.startswith(('/home/', '/usr/', '/opt/', '/mnt/', '/tmp/', '/var/')):
-            return path_str
-        
-        # If starts with / and no drive letter, it's already a Linux path
-        if path_str.startswith('/') and ':' not in path_str:
-            return path_str
-        
-        # Handle Windows paths (C:\Users\... -> /mnt/c/Users/...)
-        # This is for compatibility if paths come from Windows
-        if ':' in path_str or path_str.startswith('\\'):
-            try:
-                # Extract drive letter (C: -> c)
-                if ':' in path_str:
-                    parts = path_str.split(':', 1)
-                    if len(parts) == 2:
-                        drive = parts[0].lower().strip()
-                        rest = parts[1].lstrip('/')
-                        return f"/mnt/{drive}/{rest}"
-            except:
-                pass
-        
-        # If all else fails, return normalized path
-        return path_str
+        # Conversion is a pure string function; the same few paths are converted many times per job
+        return _wsl_path_str(str(path_input))
     
     def get_eggnog_info(self):
         """Get information about eggnog database"""
-        if not os.path.exists(self.eggnog_db_path):
+        # Stop after 10 directory entries instead of listing the whole database folder;
+        # a missing folder is reported by scandir itself, without a separate exists() probe
+        try:
+            with os.scandir(self.eggnog_db_path) as entries:
+                files = [Path(entry.path) for entry in itertools.islice(entries, 10)]
+        except (FileNotFoundError, NotADirectoryError):
             return {'error': 'eggnog_db_final folder not found'}
         
         return {
             'path': str(self.eggnog_db_path),
             'exists': True,
-            'files': list(Path(self.eggnog_db_path).glob('*'))[:10]  # First 10 files
+            'files': files  # First 10 files
         }
 
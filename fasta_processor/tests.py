@@ -1,3 +1,376 @@
-from django.test import TestCase
+import io
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import services
+from .fasta_scan import header_ko, ko_record_spans, record_ranges, scan_ko_shard
+from .models import FastaFile, ProcessingJob
+
+
+def _create_job(user, status, started_ago=timedelta(0), **fields):
+    """Create a FastaFile with a ProcessingJob that started started_ago"""
+    fasta_file = FastaFile.objects.create(
+        user=user,
+        file='fasta_files/sample.fa',
+        original_filename='sample.fa',
+        file_size=0,
+    )
+    job = ProcessingJob.objects.create(fasta_file=fasta_file, user=user, status=status, **fields)
+    # started_at is auto_now_add, so it can only be backdated with an update
+    ProcessingJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - started_ago)
+    job.refresh_from_db()
+    return job
+
+
+class JobLockTests(TestCase):
+    """Job-runner lock: a stuck holder is stopped only if it is still that job's process"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('lock-user')
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        lock_settings = override_settings(FASTA_PROCESSING_JOB_LOCK_FILE=Path(lock_dir.name) / 'job_runner.lock')
+        lock_settings.enable()
+        self.addCleanup(lock_settings.disable)
+
+    def _start_holder(self, *args, lock_fd=None):
+        """Start a sleeping process in its own session, optionally handing it the lock"""
+        process = subprocess.Popen(
+            [sys.executable, '-c', 'import time; time.sleep(60)', *args],
+            pass_fds=(lock_fd,) if lock_fd is not None else (),
+            start_new_session=True,
+        )
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        return process
+
+    def _start_job_process(self, job):
+        """Start a fake process_fasta_job process for job that holds the lock, like _dispatch_next_job"""
+        lock_fd = services._try_acquire_job_lock()
+        self.assertIsNotNone(lock_fd)
+        try:
+            process = self._start_holder('process_fasta_job', str(job.id), lock_fd=lock_fd)
+            services._write_job_lock_holder(lock_fd, process.pid, job.id)
+        finally:
+            os.close(lock_fd)
+        return process
+
+    def test_holder_matches_recorded_job(self):
+        process = self._start_holder('process_fasta_job', '7')
+        self.assertTrue(services._is_job_lock_holder(process.pid, 7))
+        self.assertFalse(services._is_job_lock_holder(process.pid, 8))
+
+    def test_unrelated_process_is_not_holder(self):
+        process = self._start_holder()
+        self.assertFalse(services._is_job_lock_holder(process.pid, 7))
+
+    def test_stuck_holder_is_stopped_and_lock_taken(self):
+        job = _create_job(self.user, 'running', started_ago=timedelta(hours=7))
+        process = self._start_job_process(job)
+
+        lock_fd = services._reclaim_stale_job_lock()
+
+        self.assertIsNotNone(lock_fd)
+        os.close(lock_fd)
+        self.assertEqual(process.wait(timeout=5), -signal.SIGTERM)
+
+    def test_fresh_holder_is_left_running(self):
+        job = _create_job(self.user, 'running', started_ago=timedelta(minutes=5))
+        process = self._start_job_process(job)
+
+        self.assertIsNone(services._reclaim_stale_job_lock())
+        self.assertIsNone(process.poll())
+
+    def test_reused_pid_is_left_running(self):
+        job = _create_job(self.user, 'running', started_ago=timedelta(hours=7))
+        lock_fd = services._try_acquire_job_lock()
+        self.addCleanup(os.close, lock_fd)
+        # The recorded PID now belongs to a process that is not job's process_fasta_job
+        unrelated = self._start_holder()
+        services._write_job_lock_holder(lock_fd, unrelated.pid, job.id)
+
+        self.assertIsNone(services._reclaim_stale_job_lock())
+        self.assertIsNone(unrelated.poll())
+
+
+class ClaimJobTests(TestCase):
+    """EggnogProcessor._claim_job: which jobs process_fasta may start, and what a claim resets"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('claim-user')
+        self.processor = services.EggnogProcessor()
+
+    def _claim(self, job):
+        claimed_job, claimed = self.processor._claim_job(job.fasta_file)
+        job.refresh_from_db()
+        job.fasta_file.refresh_from_db()
+        return claimed_job, claimed
+
+    def _create_finished_job(self, status, **fields):
+        return _create_job(
+            self.user, status,
+            started_ago=timedelta(days=1),
+            result_file='results/enzymes.csv',
+            completed_at=timezone.now() - timedelta(hours=20),
+            processing_time=3600.0,
+            **fields
+        )
+
+    def assertClaimed(self, job, claimed_job, claimed):
+        self.assertTrue(claimed)
+        self.assertEqual(claimed_job.pk, job.pk)
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.progress, 0)
+        self.assertEqual(job.progress_message, 'Starting processing...')
+        self.assertGreater(job.started_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(job.fasta_file.status, 'processing')
+
+    def test_pending_job_is_claimed(self):
+        job = _create_job(self.user, 'pending')
+        self.assertClaimed(job, *self._claim(job))
+        self.assertEqual(job.error_message, '')
+
+    def test_failed_job_is_claimed_and_results_reset(self):
+        job = self._create_finished_job('failed', error_message='DIAMOND failed', progress=40)
+        self.assertClaimed(job, *self._claim(job))
+        self.assertEqual(job.error_message, '')
+        self.assertFalse(job.result_file)
+        self.assertIsNone(job.completed_at)
+        self.assertIsNone(job.processing_time)
+
+    def test_completed_job_is_claimed_and_results_kept(self):
+        job = self._create_finished_job('completed', progress=100)
+        completed_at = job.completed_at
+        self.assertClaimed(job, *self._claim(job))
+        self.assertEqual(job.result_file.name, 'results/enzymes.csv')
+        self.assertEqual(job.completed_at, completed_at)
+        self.assertEqual(job.processing_time, 3600.0)
+
+    def test_stuck_running_job_is_claimed(self):
+        job = _create_job(self.user, 'running', started_ago=timedelta(hours=3), progress=40)
+        self.assertClaimed(job, *self._claim(job))
+        self.assertEqual(job.error_message, 'Job was stuck and has been reset')
+
+    def test_fresh_running_job_is_not_claimed(self):
+        job = _create_job(self.user, 'running', started_ago=timedelta(minutes=30), progress=40)
+        started_at = job.started_at
+
+        claimed_job, claimed = self._claim(job)
+
+        self.assertFalse(claimed)
+        self.assertEqual(claimed_job.pk, job.pk)
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.progress, 40)
+        self.assertEqual(job.started_at, started_at)
+        self.assertEqual(job.fasta_file.status, 'uploaded')
+
+    def test_missing_job_is_created_running(self):
+        fasta_file = FastaFile.objects.create(
+            user=self.user,
+            file='fasta_files/sample.fa',
+            original_filename='sample.fa',
+            file_size=0,
+        )
+
+        job, claimed = self.processor._claim_job(fasta_file)
+
+        self.assertTrue(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.fasta_file_id, fasta_file.pk)
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.progress_message, 'Starting processing...')
+        fasta_file.refresh_from_db()
+        self.assertEqual(fasta_file.status, 'processing')
+
+
+class _RecordingJob:
+    """Stands in for a ProcessingJob: keeps progress fields and records each save()"""
+
+    def __init__(self):
+        self.progress = 0
+        self.progress_message = ''
+        self.saved_fields = []
+
+    def save(self, update_fields=None):
+        self.saved_fields.append(list(update_fields))
+
+
+class MonitorProcessesTests(SimpleTestCase):
+    """EggnogProcessor._monitor_processes driving real short-lived subprocesses"""
+
+    def setUp(self):
+        self.processor = services.EggnogProcessor()
+
+    def _start(self, script):
+        process = services._register_process(subprocess.Popen(
+            ['bash', '-c', script],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        ))
+        self.addCleanup(services._unregister_process, process)
+        return process
+
+    def test_exit_codes_are_returned(self):
+        processes = [self._start('exit 3'), self._start('sleep 0.5')]
+        started = time.monotonic()
+
+        return_codes, timed_out = self.processor._monitor_processes(processes, 60)
+
+        self.assertEqual(return_codes, [3, 0])
+        self.assertFalse(timed_out)
+        self.assertLess(time.monotonic() - started, 5)
+        for process in processes:
+            self.assertNotIn(process, services._active_processes)
+
+    def test_timeout_kills_process(self):
+        process = self._start('sleep 30')
+        started = time.monotonic()
+
+        return_codes, timed_out = self.processor._monitor_processes([process], 1)
+
+        self.assertEqual(return_codes, [-1])
+        self.assertTrue(timed_out)
+        self.assertIsNotNone(process.poll())
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_diamond_progress_moves_job_progress(self):
+        job = _RecordingJob()
+        stderr_log = io.BytesIO()
+        process = self._start(
+            'echo "Processing query block 1, reference block 3/4, shape 1/1." >&2; sleep 1'
+        )
+
+        return_codes, timed_out = self.processor._monitor_processes(
+            [process], 60, job,
+            stderr_logs=[stderr_log],
+            progress_parsers=[services._parse_diamond_progress],
+            progress_range=(40, 60),
+        )
+
+        self.assertEqual(return_codes, [0])
+        self.assertFalse(timed_out)
+        # Block 3 of 4 started: 50% of the way from 40 to 60
+        self.assertEqual(job.progress, 50)
+        self.assertIn(['progress'], job.saved_fields)
+        self.assertIn(b'reference block 3/4', stderr_log.getvalue())
+
+    def test_silent_process_does_not_busy_wait(self):
+        job = _RecordingJob()
+        process = self._start('sleep 3')
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+
+        return_codes, _ = self.processor._monitor_processes(
+            [process], 60, job,
+            progress_parsers=[services._parse_diamond_progress],
+            progress_range=(40, 60),
+        )
+
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+        self.assertEqual(return_codes, [0])
+        self.assertLess(cpu_seconds, 0.5)
+        self.assertEqual(job.saved_fields, [])
+
+
+class FastaScanTests(SimpleTestCase):
+    """Byte-level FASTA helpers (fasta_scan) and the processor methods built on them"""
+
+    # Representatives: p2 is K00001's longest record; p3 and p4 tie for K00002, so p3 wins
+    PROTEOMES = (
+        b'>p1 K00001 first\nAAA\n'
+        b'>p2 K00001 longest\nAAA\nAA\n'
+        b'>p3 KO:2 tie\nCC\n'
+        b'>p4 KO00002 tie\nGG\n'
+        b'>p5 K00009 unlisted\nTTTTTTTT\n'
+    )
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = Path(tmp_dir.name)
+        self.processor = services.EggnogProcessor()
+
+    def _write(self, name, data):
+        path = self.tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+
+    def test_header_ko_normalises_ko_ids(self):
+        self.assertEqual(header_ko(b'>p1 K00813 aspartate'), b'K00813')
+        self.assertEqual(header_ko(b'>p2 KO:813'), b'K00813')
+        self.assertEqual(header_ko(b'>p3 KO00813'), b'K00813')
+        # K##### is preferred over the other spellings
+        self.assertEqual(header_ko(b'>p4 KO:1 K00813'), b'K00813')
+        self.assertIsNone(header_ko(b'>p5 hypothetical protein'))
+
+    def test_ko_record_spans_merges_adjacent_records(self):
+        records = [
+            b'>a K00001\nAAA\n',
+            b'>c K00002 K00003\nG\n',
+            b'>b K00002\nCC\n',
+            b'>e K00003\nA\n',
+            b'>d none\nTT',
+        ]
+        path = self._write('spans.faa', b''.join(records))
+
+        spans = ko_record_spans(path, {b'K00001', b'K00003'})
+
+        data = b''.join(records)
+        self.assertEqual([data[start:end] for start, end in spans], [records[0] + records[1], records[3]])
+        self.assertEqual(ko_record_spans(self._write('empty.faa', b''), {b'K00001'}), [])
+
+    def test_scan_ko_shard_keeps_longest_record(self):
+        path = self._write('proteomes.faa', self.PROTEOMES)
+
+        best = scan_ko_shard(path, 0, len(self.PROTEOMES), {b'K00001', b'K00002'})
+
+        self.assertEqual(list(best.items()), [
+            (b'K00001', (b'>p2 K00001 longest', b'AAAAA')),
+            (b'K00002', (b'>p3 KO:2 tie', b'CC')),
+        ])
+
+    def test_sharded_selection_matches_single_scan(self):
+        path = self._write('proteomes.faa', self.PROTEOMES)
+        kos = frozenset({b'K00001', b'K00002'})
+        single_fa = str(self.tmp_path / 'single.fa')
+        sharded_fa = str(self.tmp_path / 'sharded.fa')
+        self.assertGreater(len(record_ranges(path, 3)), 1)
+
+        self.assertEqual(self.processor._select_ko_representatives(path, kos, single_fa), 2)
+        with mock.patch.object(services, '_PARALLEL_SCAN_MIN_BYTES', 0):
+            self.assertEqual(self.processor._select_ko_representatives(path, kos, sharded_fa, n_workers=3), 2)
+
+        expected = b'>p2 K00001 longest\nAAAAA\n>p3 KO:2 tie\nCC\n'
+        self.assertEqual(Path(single_fa).read_bytes(), expected)
+        self.assertEqual(Path(sharded_fa).read_bytes(), expected)
+
+    def test_fasta_quick_stats(self):
+        path = self._write('stats.faa', b'>a\nAC\nGT\n>b desc\r\nA\r\n>c\n')
+        self.assertEqual(self.processor._fasta_quick_stats(path), (3, 5, 4))
+        self.assertEqual(self.processor._fasta_quick_stats(self._write('empty.faa', b'')), (0, 0, 0))
+
+    def test_split_fasta_round_trip(self):
+        data = b''.join(b'>seq%d K%05d\n%s\n' % (i, i, b'ACGT' * (i % 7 + 1)) for i in range(50))
+        path = self._write('input.faa', data)
+
+        parts = self.processor._split_fasta(path, self.tmp_path / 'splits', 4)
+
+        self.assertEqual(len(parts), 4)
+        contents = [Path(part).read_bytes() for part in parts]
+        self.assertEqual(b''.join(contents), data)
+        for content in contents:
+            self.assertTrue(content.startswith(b'>'))
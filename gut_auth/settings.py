@@ -159,6 +159,10 @@ FASTA_PROCESSING_USE_NICE = True  # Use 'nice' command to lower process priority
                                    # Set to False if 'nice' command is not available
 FASTA_PROCESSING_NICE_VALUE = 10  # Nice value (0-19, higher = lower priority, less CPU usage)
                                    # Recommended: 10-15 for background processing
+FASTA_PROCESSING_USE_PYHMMER = False  # Run the KofamScan HMM search in-process with pyhmmer (if installed)
+                                      # Falls back to the hmmsearch binary when pyhmmer is missing or fails
+FASTA_PROCESSING_JOB_LOCK_FILE = MEDIA_ROOT / 'job_runner.lock'  # Lock ensuring one processing job runs at a time
+                                                                # Must be on a local filesystem shared by the web server and job processes
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field